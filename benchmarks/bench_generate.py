@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codegen import BlockGraph, generate_lines
+from model import VERTICAL_SPACING, BlockModel
+
+
+def straight_line(count):
+    model = BlockModel()
+    for i in range(count):
+        model.add_block("Addition", ("x", "x", str(i)), 50, i * VERTICAL_SPACING)
+    return model
+
+
+def nested_loops(count):
+    model = BlockModel()
+    for i in range(count // 2):
+        y = i * VERTICAL_SPACING
+        model.add_block("Loop", ("range(2)",), 50, y)
+        model.add_block("Print", ("i",), 250, y)
+    return model
+
+
+def bench(layout, count, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        model = layout(count)
+        start = time.perf_counter()
+        lines = generate_lines(BlockGraph(model))
+        best = min(best, time.perf_counter() - start)
+    return best, len(lines)
+
+
+def bench_memory(count):
+    tracemalloc.start()
+    model = nested_loops(count)
+    built = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    lines = generate_lines(BlockGraph(model))
+    elapsed = time.perf_counter() - start
+    print(f"headless model, {count} blocks: {built / 2 ** 20:.1f} MiB ({built / count:.0f} bytes/block), "
+          f"generated {len(lines)} lines in {elapsed * 1000:.0f} ms")
+
+
+def main():
+    sizes = [1000, 2500, 5000, 10000]
+    for layout in (straight_line, nested_loops):
+        print(f"{layout.__name__}:")
+        baseline = None
+        for count in sizes:
+            elapsed, line_count = bench(layout, count)
+            per_block = elapsed / count * 1e6
+            baseline = baseline or per_block
+            print(f"  {count:>6} blocks  {line_count:>6} lines  {elapsed * 1000:8.2f} ms  "
+                  f"{per_block:6.2f} us/block  x{per_block / baseline:.2f}")
+    bench_memory(100000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import ast
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codegen import BlockGraph, build_module, generate_source
+from executor import SOURCE_NAME
+from model import VERTICAL_SPACING, BlockModel
+from optimizer import optimize
+
+
+def chain(model, blocks, x, y):
+    for block_type, args in blocks:
+        model.add_block(block_type, args, x, y)
+        y += VERTICAL_SPACING
+    return y
+
+
+def invariant_math(iterations):
+    model = BlockModel()
+    y = chain(model, [("Variable", ("x = 10",)), ("Variable", ("y = 3",)), ("Variable", ("total = 0",))], 600, 0)
+    model.add_block("Loop", (f"range({iterations})",), 50, y)
+    chain(model, [
+        ("Exponentiation", ("power", "x", "y")),
+        ("SquareRoot", ("root", "power")),
+        ("Multiplication", ("scaled", "root", "i")),
+        ("Addition", ("total", "total", "scaled")),
+    ], 250, y)
+    return model
+
+
+def square_roots(iterations):
+    model = BlockModel()
+    y = chain(model, [("Variable", ("total = 0",))], 600, 0)
+    model.add_block("Loop", (f"range({iterations})",), 50, y)
+    chain(model, [
+        ("SquareRoot", ("root", "i")),
+        ("Addition", ("total", "total", "root")),
+    ], 250, y)
+    return model
+
+
+def function_roots(iterations):
+    model = BlockModel()
+    model.add_block("Function", ("compute(n)",), 50, 0)
+    chain(model, [("Variable", ("total = 0",)), ("Loop", ("range(n)",)), ("Return", ("total",))], 250, 0)
+    chain(model, [
+        ("SquareRoot", ("root", "i")),
+        ("Addition", ("total", "total", "root")),
+    ], 450, VERTICAL_SPACING)
+    model.add_block("Variable", (f"total = compute({iterations})",), 50, 5 * VERTICAL_SPACING)
+    return model
+
+
+def failing_loop(statement):
+    model = BlockModel()
+    y = chain(model, [("Variable", ("z = 0",))], 600, 0)
+    model.add_block("Loop", ("range(3)",), 50, y)
+    chain(model, [("Print", ("'hi'",)), ("Variable", (statement,))], 250, y)
+    return model
+
+
+def run_output(code):
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            exec(code, {})
+    except Exception as e:
+        return output.getvalue(), type(e).__name__
+    return output.getvalue(), None
+
+
+def check_ordering():
+    for statement in ("y = 1 / z", "y = undefined_name"):
+        model = failing_loop(statement)
+        plain = run_output(compile(generate_source(model), SOURCE_NAME, "exec"))
+        optimized = run_output(compile(optimize(build_module(BlockGraph(model))), SOURCE_NAME, "exec"))
+        if plain != optimized:
+            raise AssertionError(f"{statement!r} after print: plain {plain}, optimized {optimized}")
+
+
+def best_time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(layout, iterations, repeat=5):
+    model = layout(iterations)
+    source = generate_source(model)
+    graph = BlockGraph(model)
+
+    plain_code = compile(source, SOURCE_NAME, "exec")
+    optimized_code = compile(optimize(build_module(graph)), SOURCE_NAME, "exec")
+    plain_namespace = {}
+    optimized_namespace = {}
+    exec(plain_code, plain_namespace)
+    exec(optimized_code, optimized_namespace)
+    if plain_namespace["total"] != optimized_namespace["total"]:
+        raise AssertionError(f"{layout.__name__}: optimized result differs")
+
+    parse_time = best_time(lambda: compile(source, SOURCE_NAME, "exec"), repeat)
+    build_time = best_time(lambda: compile(optimize(build_module(graph)), SOURCE_NAME, "exec"), repeat)
+    plain = best_time(lambda: exec(plain_code, {}), repeat)
+    optimized = best_time(lambda: exec(optimized_code, {}), repeat)
+    print(f"{layout.__name__} ({iterations} iterations):")
+    print(f"  compile  text {parse_time * 1000:7.2f} ms   ast+optimize {build_time * 1000:7.2f} ms")
+    print(f"  run      text {plain * 1000:7.2f} ms   optimized    {optimized * 1000:7.2f} ms   "
+          f"x{plain / optimized:.2f}")
+
+
+def main():
+    check_ordering()
+    for layout in (invariant_math, square_roots, function_roots):
+        bench(layout, 200000)
+    print()
+    print(ast.unparse(optimize(build_module(BlockGraph(invariant_math(10))))))
+
+
+if __name__ == "__main__":
+    main()
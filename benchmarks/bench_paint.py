@@ -0,0 +1,66 @@
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication, QGraphicsItem, QGraphicsView
+
+from main import Block, BlockScene
+from model import BlockModel
+
+BLOCK_TYPES = ["Print", "Variable", "Loop", "Addition", "Multiplication", "StringConcat"]
+
+
+def build_scene(count):
+    model = BlockModel()
+    scene = BlockScene(model, 0, 0, 2000, 1500)
+    columns = 10
+    for i in range(count):
+        model.add_block(BLOCK_TYPES[i % len(BLOCK_TYPES)], x=(i % columns) * 190, y=(i // columns) * 60)
+    scene.setSceneRect(scene.itemsBoundingRect())
+    return scene
+
+
+def drag_frames(view, block, steps):
+    frames = []
+    start = block.pos()
+    for step in range(steps):
+        block.setPos(start.x() + step * 3, start.y() + step * 2)
+        view.centerOn(block)
+        began = time.perf_counter()
+        view.viewport().repaint()
+        frames.append(time.perf_counter() - began)
+    return frames
+
+
+def report(label, frames):
+    frames = sorted(frames)
+    p95 = frames[int(len(frames) * 0.95) - 1]
+    print(f"  {label:<24} mean {statistics.mean(frames) * 1000:6.2f} ms  "
+          f"p95 {p95 * 1000:6.2f} ms  max {frames[-1] * 1000:6.2f} ms")
+
+
+def main(count=5000, steps=300):
+    app = QApplication.instance() or QApplication(sys.argv)
+    scene = build_scene(count)
+    view = QGraphicsView(scene)
+    view.resize(1200, 800)
+    view.show()
+    app.processEvents()
+
+    blocks = [item for item in scene.items() if isinstance(item, Block)]
+    dragged = blocks[len(blocks) // 2]
+    print(f"Dragging one block across a {count}-block scene ({steps} frames):")
+    for label, mode in (("no cache", QGraphicsItem.NoCache),
+                        ("device coordinate cache", QGraphicsItem.DeviceCoordinateCache)):
+        for block in blocks:
+            block.setCacheMode(mode)
+        drag_frames(view, dragged, 10)
+        report(label, drag_frames(view, dragged, steps))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ("imported", "shown", "interactive")
+
+
+def launch():
+    env = dict(os.environ)
+    if sys.platform.startswith("linux") and not env.get("DISPLAY") and not env.get("WAYLAND_DISPLAY"):
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    spawned = time.time()
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), "--startup-probe"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    for line in result.stdout.splitlines():
+        if line.startswith("startup "):
+            times = dict(field.split("=") for field in line.split()[1:])
+            return {stage: float(times[stage]) - spawned for stage in STAGES}
+    raise RuntimeError(f"no startup report from main.py (exit code {result.returncode}):\n{result.stderr}")
+
+
+def show(label, timings):
+    print(f"{label + ':':<21} " + "   ".join(f"{stage} {timings[stage] * 1000:7.1f} ms" for stage in STAGES))
+
+
+def main(runs=10):
+    try:
+        import PySide6
+    except ImportError:
+        print("PySide6 is not installed; the IDE cannot be started")
+        return 1
+    cold = launch()
+    warm = [launch() for _ in range(runs)]
+    show("cold start", cold)
+    show(f"warm median of {runs}", {stage: statistics.median(run[stage] for run in warm) for stage in STAGES})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
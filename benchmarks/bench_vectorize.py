@@ -0,0 +1,125 @@
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codegen import BlockGraph, build_module, generate_source
+from executor import SOURCE_NAME
+from model import VERTICAL_SPACING, BlockModel
+from vectorize import vectorize
+
+OPERATORS = ["Addition", "Subtraction", "Multiplication", "Division", "Modulo", "Exponentiation"]
+
+
+def loop_program(iterations, setup, body):
+    model = BlockModel()
+    y = 0
+    for args in setup:
+        model.add_block("Variable", args, 600, y)
+        y += VERTICAL_SPACING
+    model.add_block("Loop", (f"range({iterations})",), 50, y)
+    for block_type, args in body:
+        model.add_block(block_type, args, 250, y)
+        y += VERTICAL_SPACING
+    return model
+
+
+def elementwise(iterations):
+    return loop_program(iterations, [("factor = 3",), ("offset = 10",), ("values = []",)], [
+        ("Multiplication", ("scaled", "i", "factor")),
+        ("Modulo", ("bucket", "scaled", "7")),
+        ("Exponentiation", ("power", "bucket", "2")),
+        ("Addition", ("shifted", "power", "offset")),
+        ("ListAppend", ("values", "shifted")),
+    ])
+
+
+def random_program(rng):
+    atoms = ["i", "a", "b", "0", "1", "2", "-3", "0.5", "2.5"]
+    setup = [(f"a = {rng.choice(['7', '-4', '0', '1.5', '1000'])}",), (f"b = {rng.choice(['3', '-2', '0.25'])}",),
+             ("out = []",)]
+    body = []
+    for step in range(rng.randint(1, 5)):
+        target = f"t{step}"
+        body.append((rng.choice(OPERATORS), (target, rng.choice(atoms), rng.choice(atoms))))
+        atoms.append(target)
+        if rng.random() < 0.5:
+            body.append(("ListAppend", ("out", target)))
+    return loop_program(rng.choice([0, 5, 300, 2000]), setup, body)
+
+
+def run(code):
+    namespace = {}
+    try:
+        exec(code, namespace)
+    except Exception as e:
+        return type(e).__name__
+    return {name: value for name, value in namespace.items() if not name.startswith(("_vl_", "__"))}
+
+
+def same(left, right):
+    if isinstance(left, float) and isinstance(right, float) and math.isnan(left) and math.isnan(right):
+        return True
+    if isinstance(left, list) and isinstance(right, list):
+        return len(left) == len(right) and all(same(a, b) for a, b in zip(left, right))
+    if isinstance(left, dict) and isinstance(right, dict):
+        return left.keys() == right.keys() and all(same(left[key], right[key]) for key in left)
+    return type(left) is type(right) and left == right
+
+
+def compile_both(model):
+    scalar = compile(generate_source(model), SOURCE_NAME, "exec")
+    vector = compile(vectorize(build_module(BlockGraph(model))), SOURCE_NAME, "exec")
+    return scalar, vector
+
+
+def check(programs=300, seed=0):
+    rng = random.Random(seed)
+    mismatches = 0
+    for number in range(programs):
+        model = random_program(rng)
+        scalar, vector = compile_both(model)
+        expected, actual = run(scalar), run(vector)
+        if not same(expected, actual):
+            mismatches += 1
+            print(f"mismatch in program {number}:\n{generate_source(model)}\n  scalar: {expected}\n  vector: {actual}")
+    print(f"correctness: {programs - mismatches}/{programs} random programs match the scalar output")
+    return mismatches
+
+
+def best_time(code, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        namespace = {}
+        start = time.perf_counter()
+        exec(code, namespace)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(iterations, repeat=3):
+    scalar, vector = compile_both(elementwise(iterations))
+    if not same(run(scalar), run(vector)):
+        raise AssertionError("vectorized result differs from the scalar result")
+    plain = best_time(scalar, repeat)
+    vectorized = best_time(vector, repeat)
+    print(f"elementwise loop, {iterations:>8} iterations: scalar {plain * 1000:8.2f} ms   "
+          f"numpy {vectorized * 1000:8.2f} ms   x{plain / vectorized:.1f}")
+
+
+def main():
+    try:
+        import numpy
+    except ImportError:
+        print("NumPy is not installed; vectorized loops fall back to the scalar code")
+    failures = check()
+    for iterations in (1000, 100000, 1000000):
+        bench(iterations)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
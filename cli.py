@@ -0,0 +1,192 @@
+import argparse
+import ast
+import difflib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from codegen import BlockGraph, CodeGenerator, build_module, generate_source
+from executor import DEFAULT_MEMORY_LIMIT_MB, DEFAULT_TIMEOUT, CompileCache, compile_segments, run_program
+from optimizer import optimize
+from project import ProjectError, load_program
+
+
+def output_path(path, output_dir):
+    name = os.path.splitext(os.path.basename(path))[0] + ".py"
+    return os.path.join(output_dir if output_dir else os.path.dirname(path), name)
+
+
+def file_error(error):
+    if isinstance(error, (OSError, ProjectError, SyntaxError)):
+        return str(error)
+    return f"{type(error).__name__}: {error}"
+
+
+def generate_file(job):
+    path, output_dir, optimized = job
+    started = time.perf_counter()
+    try:
+        model = load_program(path)
+        if optimized:
+            source = ast.unparse(optimize(build_module(BlockGraph(model))))
+        else:
+            source = generate_source(model)
+        target = output_path(path, output_dir)
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(source + "\n" if source else "")
+    except Exception as e:
+        return path, None, 0, 0, time.perf_counter() - started, file_error(e)
+    line_count = source.count("\n") + 1 if source else 0
+    return path, target, len(model), line_count, time.perf_counter() - started, None
+
+
+def expected_path(path, expected_dir):
+    name = os.path.splitext(os.path.basename(path))[0] + ".out"
+    return os.path.join(expected_dir if expected_dir else os.path.dirname(path), name)
+
+
+def output_diff(expected, actual, limit=20):
+    lines = list(difflib.unified_diff(expected.splitlines(), actual.splitlines(), "expected", "actual",
+                                      lineterm=""))
+    if len(lines) > limit:
+        lines = lines[:limit] + [f"... {len(lines) - limit} more lines"]
+    return "\n".join(lines)
+
+
+def test_file(job):
+    path, expected_dir, timeout, memory_limit, optimized, vectorized, update = job
+    started = time.perf_counter()
+    try:
+        generator = CodeGenerator(load_program(path))
+        generator.generate()
+        segments, trees = generator.run_segments(optimized, vectorized)
+        compiled = compile_segments(CompileCache(), segments, trees, optimized, vectorized)
+        status, stdout, stderr = run_program(compiled, timeout, memory_limit)
+    except Exception as e:
+        return path, "error", time.perf_counter() - started, file_error(e)
+
+    elapsed = time.perf_counter() - started
+    if status is None:
+        return path, "error", elapsed, f"timed out after {timeout} s"
+    if status != 0:
+        return path, "error", elapsed, stderr.strip().splitlines()[-1] if stderr.strip() else f"exit code {status}"
+
+    target = expected_path(path, expected_dir)
+    try:
+        if update:
+            with open(target, "w", encoding="utf-8", newline="") as f:
+                f.write(stdout)
+            return path, "pass", elapsed, f"wrote {target}"
+        with open(target, encoding="utf-8") as f:
+            expected = f.read()
+    except Exception as e:
+        return path, "error", elapsed, file_error(e)
+    if stdout != expected:
+        return path, "fail", elapsed, output_diff(expected, stdout)
+    return path, "pass", elapsed, None
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def run_jobs(function, jobs, workers):
+    if workers == 1 or len(jobs) == 1:
+        return map(function, jobs)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    chunksize = max(1, len(jobs) // (workers * 4))
+    try:
+        return list(pool.map(function, jobs, chunksize=chunksize))
+    finally:
+        pool.shutdown()
+
+
+def generate_command(args):
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    jobs = [(path, args.output_dir, args.optimize) for path in args.programs]
+    workers = max(1, args.jobs)
+
+    started = time.perf_counter()
+    failures = 0
+    total_blocks = 0
+    for path, target, block_count, line_count, elapsed, error in run_jobs(generate_file, jobs, workers):
+        if error:
+            failures += 1
+            print(f"{path}: error: {error}", file=sys.stderr)
+            continue
+        total_blocks += block_count
+        print(f"{path}: {block_count} blocks, {line_count} lines in {elapsed * 1000:.1f} ms -> {target}")
+    elapsed = time.perf_counter() - started
+
+    print(f"Generated {len(jobs) - failures}/{len(jobs)} programs ({total_blocks} blocks) "
+          f"in {elapsed:.2f} s with {workers} workers")
+    return 1 if failures else 0
+
+
+def test_command(args):
+    jobs = [(path, args.expected_dir, args.timeout, args.memory_limit, args.optimize, args.numpy, args.update)
+            for path in args.programs]
+    workers = max(1, args.jobs)
+
+    started = time.perf_counter()
+    counts = {"pass": 0, "fail": 0, "error": 0}
+    latencies = []
+    for path, status, elapsed, detail in run_jobs(test_file, jobs, workers):
+        counts[status] += 1
+        latencies.append(elapsed)
+        if status == "pass" and not args.verbose and not detail:
+            continue
+        print(f"{status.upper()} {path} ({elapsed * 1000:.1f} ms)" + (f": {detail}" if detail else ""),
+              file=sys.stdout if status == "pass" else sys.stderr)
+    elapsed = time.perf_counter() - started
+
+    print(f"{counts['pass']} passed, {counts['fail']} failed, {counts['error']} errors "
+          f"out of {len(jobs)} programs in {elapsed:.2f} s with {workers} workers "
+          f"({len(jobs) / elapsed if elapsed > 0 else 0:.1f} programs/s)")
+    print("latency: " + "  ".join(f"{name} {percentile(latencies, fraction) * 1000:.1f} ms"
+                                  for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99),
+                                                         ("max", 1.0))))
+    return 0 if counts["pass"] == len(jobs) else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Headless VisualLang tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Generate Python code from block programs.")
+    generate.add_argument("programs", nargs="+", help="Program files to generate code for")
+    generate.add_argument("-o", "--output-dir", help="Directory for the .py files (default: next to each program)")
+    generate.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    generate.add_argument("-O", "--optimize", action="store_true",
+                          help="Fold constants and hoist loop-invariant blocks in the generated code")
+    generate.set_defaults(handler=generate_command)
+
+    test = commands.add_parser("test", help="Run block programs and compare their output with the expected output.")
+    test.add_argument("programs", nargs="+", help="Program files to run")
+    test.add_argument("-e", "--expected-dir",
+                      help="Directory with the expected output files (default: a .out file next to each program)")
+    test.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of programs run at once")
+    test.add_argument("-t", "--timeout", type=int, default=DEFAULT_TIMEOUT, help="Time limit per program in seconds")
+    test.add_argument("-m", "--memory-limit", type=int, default=DEFAULT_MEMORY_LIMIT_MB,
+                      help="Memory limit per program in MB (0 for none)")
+    test.add_argument("-O", "--optimize", action="store_true", help="Run the optimized code, like the Optimize option")
+    test.add_argument("--numpy", action="store_true", help="Run simple loops with NumPy, like the NumPy loops option")
+    test.add_argument("-u", "--update", action="store_true",
+                      help="Write each program's output as its expected output instead of comparing")
+    test.add_argument("-v", "--verbose", action="store_true", help="Also list the programs that pass")
+    test.set_defaults(handler=test_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+import ast
+from bisect import bisect_right
+
+from executor import SOURCE_NAME
+from model import VERTICAL_SPACING, VERTICAL_TOLERANCE, INDENT_THRESHOLD
+from registry import BLOCK_TYPES, is_container
+
+
+class BlockGraph:
+    def __init__(self, model):
+        self.model = model
+        self.rows = model.index.rows(VERTICAL_TOLERANCE)
+        self.blocks = [node_id for row in self.rows for node_id in row]
+        self.successor = {}
+        self.roots = []
+        self._resolve_nesting()
+        self._link_successors()
+
+    def _resolve_nesting(self):
+        nodes = self.model.nodes
+        position = self.model.index.position
+        for node_id in self.blocks:
+            node = nodes[node_id]
+            node.parent = None
+            node.children = ()
+
+        children = {}
+        prev_group = None
+        for group in self.rows:
+            group.sort(key=lambda node_id: position(node_id)[0])
+
+            if prev_group:
+                leftmost_x = position(group[0])[0]
+                if abs(leftmost_x - position(prev_group[0])[0]) < INDENT_THRESHOLD:
+                    prev_group = group
+                    continue
+            prev_group = group
+
+            for j in range(1, len(group)):
+                node_id = group[j]
+                prev_id = group[j-1]
+                if (position(node_id)[0] > position(prev_id)[0] + INDENT_THRESHOLD and
+                    is_container(nodes[prev_id].block_type)):
+                    nodes[node_id].parent = prev_id
+                    children.setdefault(prev_id, []).append(node_id)
+
+        for parent_id, child_ids in children.items():
+            nodes[parent_id].children = tuple(child_ids)
+
+    def _link_successors(self):
+        nodes = self.model.nodes
+        index = self.model.index
+        position = index.position
+        claimed = set()
+        for node_id in self.blocks:
+            x, y = position(node_id)
+            target_y = y + VERTICAL_SPACING
+            best = None
+            best_key = None
+            for candidate in index.query(x - INDENT_THRESHOLD, target_y - VERTICAL_TOLERANCE,
+                                         x + INDENT_THRESHOLD, target_y + VERTICAL_TOLERANCE):
+                cx, cy = position(candidate)
+                if (candidate == node_id or candidate in claimed or nodes[candidate].parent is not None or
+                        abs(cy - target_y) >= VERTICAL_TOLERANCE or abs(cx - x) >= INDENT_THRESHOLD):
+                    continue
+                key = (abs(cy - target_y), abs(cx - x))
+                if best is None or key < best_key:
+                    best, best_key = candidate, key
+            if best is not None:
+                self.successor[node_id] = best
+                claimed.add(best)
+
+        self.roots = [node_id for node_id in self.blocks
+                      if nodes[node_id].parent is None and node_id not in claimed]
+
+    def children(self, node_id):
+        position = self.model.index.position
+        return sorted(self.model.nodes[node_id].children, key=lambda child: position(child)[1])
+
+    def subtree(self, node_id):
+        ids = [node_id]
+        stack = list(reversed(self.children(node_id)))
+        while stack:
+            current = stack.pop()
+            ids.append(current)
+            successor = self.successor.get(current)
+            if successor is not None:
+                stack.append(successor)
+            stack.extend(reversed(self.children(current)))
+        return ids
+
+
+def _local_parent(model, node_id):
+    index = model.index
+    position = index.position
+    x, y = position(node_id)
+    row = index.band(y - VERTICAL_TOLERANCE, y + VERTICAL_TOLERANCE)
+    previous_y = index.preceding_y(min(position(other)[1] for other in row))
+    if previous_y is not None:
+        previous_row = index.band(previous_y - VERTICAL_TOLERANCE, previous_y)
+        leftmost_x = min(position(other)[0] for other in row)
+        if abs(leftmost_x - min(position(other)[0] for other in previous_row)) < INDENT_THRESHOLD:
+            return None
+
+    left = max((other for other in row if other != node_id and position(other)[0] <= x),
+               key=lambda other: position(other)[0], default=None)
+    if left is not None and x > position(left)[0] + INDENT_THRESHOLD and is_container(model[left].block_type):
+        return left
+    return None
+
+
+def _aligned_block(model, node_id, x, target_y, roots_only):
+    position = model.index.position
+    best = None
+    best_key = None
+    for candidate in model.index.query(x - INDENT_THRESHOLD, target_y - VERTICAL_TOLERANCE,
+                                       x + INDENT_THRESHOLD, target_y + VERTICAL_TOLERANCE):
+        cx, cy = position(candidate)
+        if (candidate == node_id or abs(cy - target_y) >= VERTICAL_TOLERANCE or abs(cx - x) >= INDENT_THRESHOLD or
+                (roots_only and _local_parent(model, candidate) is not None)):
+            continue
+        key = (abs(cy - target_y), abs(cx - x))
+        if best is None or key < best_key:
+            best, best_key = candidate, key
+    return best
+
+
+def preview_links(model, node_id):
+    x, y = model.index.position(node_id)
+    parent = _local_parent(model, node_id)
+    predecessor = None
+    if parent is None:
+        predecessor = _aligned_block(model, node_id, x, y - VERTICAL_SPACING, False)
+    successor = _aligned_block(model, node_id, x, y + VERTICAL_SPACING, True)
+    return parent, predecessor, successor
+
+
+def walk(graph):
+    nodes = graph.model.nodes
+    stack = [(node_id, 0) for node_id in reversed(graph.roots)]
+    while stack:
+        node_id, indent_level = stack.pop()
+        node = nodes[node_id]
+        nested_blocks = graph.children(node_id) if is_container(node.block_type) else []
+        yield node, indent_level, bool(nested_blocks)
+
+        successor = graph.successor.get(node_id)
+        if successor is not None:
+            stack.append((successor, indent_level))
+        stack.extend((nested, indent_level + 1) for nested in reversed(nested_blocks))
+
+
+def block_fragment(block, indent_level, has_children):
+    fragment = []
+    line = generate_block_code(block, indent_level)
+    if line:
+        fragment.append(line)
+    if is_container(block.block_type) and not has_children:
+        fragment.append("    " * (indent_level + 1) + "pass")
+    return fragment
+
+
+def generate_lines(graph):
+    lines = []
+    for block, indent_level, has_children in walk(graph):
+        lines.extend(block_fragment(block, indent_level, has_children))
+    return lines
+
+
+def generate_source(model):
+    return "\n".join(generate_lines(BlockGraph(model)))
+
+
+def _relocate(statement, line_offset, column_offset):
+    for node in ast.walk(statement):
+        if "lineno" in node._attributes:
+            node.lineno += line_offset
+            node.end_lineno += line_offset
+            node.col_offset += column_offset
+            node.end_col_offset += column_offset
+
+
+def block_statements(block, line, indent_level):
+    source = generate_block_code(block, 0)
+    if not source:
+        return []
+    if is_container(block.block_type):
+        source += "\n    pass"
+    try:
+        statements = ast.parse(source, SOURCE_NAME).body
+    except SyntaxError as e:
+        e.lineno = (e.lineno or 1) + line - 1
+        e.end_lineno = e.lineno
+        e.text = "    " * indent_level + (e.text or "")
+        e.offset = (e.offset or 0) + 4 * indent_level
+        e.end_offset = None
+        raise
+    for statement in statements:
+        _relocate(statement, line - 1, 4 * indent_level)
+    return statements
+
+
+def build_module(graph):
+    module = ast.Module(body=[], type_ignores=[])
+    bodies = [module.body]
+    containers = []
+    line = 1
+    for block, indent_level, has_children in walk(graph):
+        del bodies[indent_level + 1:]
+        statements = block_statements(block, line, indent_level)
+        bodies[indent_level].extend(statements)
+        line += bool(statements)
+        if statements and is_container(block.block_type):
+            if has_children:
+                container = statements[-1]
+                container.body = []
+                bodies.append(container.body)
+                containers.append(container)
+            else:
+                line += 1
+    for container in reversed(containers):
+        if not container.body:
+            container.body.append(ast.copy_location(ast.Pass(), container))
+        last = container.body[-1]
+        container.end_lineno = last.end_lineno
+        container.end_col_offset = last.end_col_offset
+    return module
+
+
+def diff_lines(old, new):
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    old_end, new_end = len(old), len(new)
+    while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+    if start == old_end and start == new_end:
+        return []
+    return [(start, old_end, new[start:new_end])]
+
+
+class CodeGenerator:
+    def __init__(self, model):
+        self.model = model
+        self.lines = []
+        self.line_blocks = []
+        self._graph = None
+        self._fragments = {}
+        self._block_lines = {}
+        self._segment_starts = []
+        self._dirty = set()
+        self._layout_dirty = True
+        model.add_listener(self)
+
+    def block_added(self, node):
+        self._layout_dirty = True
+
+    def block_moved(self, node):
+        self._layout_dirty = True
+
+    def block_changed(self, node):
+        self._dirty.add(node.id)
+
+    def block_removed(self, node):
+        self._fragments.pop(node.id, None)
+        self._dirty.discard(node.id)
+        self._layout_dirty = True
+
+    def model_reset(self):
+        self._fragments.clear()
+        self._dirty.clear()
+        self._layout_dirty = True
+
+    def batch_started(self):
+        pass
+
+    def batch_finished(self):
+        pass
+
+    def generate(self):
+        if self._layout_dirty or self._graph is None:
+            hunks = self._regenerate()
+        else:
+            hunks = self._refresh_dirty()
+        self._dirty.clear()
+        return hunks
+
+    def _fragment(self, block, indent_level, has_children):
+        key = (block.block_type, block.args, indent_level, has_children)
+        cached = self._fragments.get(block.id)
+        if cached is None or cached[0] != key:
+            cached = (key, block_fragment(block, indent_level, has_children))
+            self._fragments[block.id] = cached
+        return cached[1]
+
+    def _regenerate(self):
+        self._graph = BlockGraph(self.model)
+        self._layout_dirty = False
+        lines = []
+        line_blocks = []
+        block_lines = {}
+        segment_starts = []
+        for block, indent_level, has_children in walk(self._graph):
+            block_lines[block.id] = len(lines)
+            if indent_level == 0:
+                segment_starts.append(len(lines))
+            fragment = self._fragment(block, indent_level, has_children)
+            lines.extend(fragment)
+            line_blocks.extend([block.id] * len(fragment))
+        hunks = diff_lines(self.lines, lines)
+        self.lines = lines
+        self.line_blocks = line_blocks
+        self._block_lines = block_lines
+        self._segment_starts = segment_starts
+        return hunks
+
+    def is_current(self):
+        return self._graph is not None and not self._layout_dirty and not self._dirty
+
+    def module(self):
+        return build_module(self._graph)
+
+    def segments(self):
+        bounds = self._segment_starts + [len(self.lines)]
+        return [(start + 1, "\n".join(self.lines[start:end]))
+                for start, end in zip(bounds, bounds[1:]) if end > start]
+
+    def block_spans(self):
+        spans = {}
+        open_blocks = []
+        for block_id, start in self._block_lines.items():
+            key, fragment = self._fragments[block_id]
+            indent_level = key[2]
+            while open_blocks and open_blocks[-1][1] >= indent_level:
+                closed_id = open_blocks.pop()[0]
+                spans[closed_id] = spans[closed_id][:2] + (start,)
+            spans[block_id] = (start, start + len(fragment), start + len(fragment))
+            open_blocks.append((block_id, indent_level))
+        for block_id, _ in open_blocks:
+            spans[block_id] = spans[block_id][:2] + (len(self.lines),)
+        return spans
+
+    def run_segments(self, optimize=False, vectorize=False, session=False):
+        per_segment = session or not optimize
+        segments = self.segments() if per_segment else [(1, "\n".join(self.lines))]
+        trees = None
+        if optimize or vectorize:
+            trees = self.segment_modules() if per_segment else [self.module()]
+        return segments, trees
+
+    def segment_modules(self):
+        bounds = self._segment_starts + [len(self.lines)]
+        first_lines = [start + 1 for start, end in zip(bounds, bounds[1:]) if end > start]
+        modules = [ast.Module(body=[], type_ignores=[]) for _ in first_lines]
+        for statement in self.module().body:
+            modules[bisect_right(first_lines, statement.lineno) - 1].body.append(statement)
+        return modules
+
+    def _refresh_dirty(self):
+        nodes = self.model.nodes
+        hunks = []
+        for node_id in self._dirty:
+            start = self._block_lines.get(node_id)
+            cached = self._fragments.get(node_id)
+            if start is None or cached is None:
+                continue
+            _, _, indent_level, has_children = cached[0]
+            old_fragment = cached[1]
+            new_fragment = self._fragment(nodes[node_id], indent_level, has_children)
+            if len(new_fragment) != len(old_fragment):
+                return self._regenerate()
+            if new_fragment != old_fragment:
+                hunks.append((start, start + len(old_fragment), new_fragment))
+        hunks.sort(key=lambda hunk: hunk[0])
+        for start, end, fragment in hunks:
+            self.lines[start:end] = fragment
+        return hunks
+
+
+def generate_block_code(block, indent_level):
+    spec = BLOCK_TYPES.get(block.block_type)
+    if spec is None:
+        return ""
+    return spec.emit(block.args, "    " * indent_level)
@@ -0,0 +1,144 @@
+from contextlib import nullcontext
+
+from PySide6.QtGui import QUndoCommand
+
+MOVE_COMMAND_ID = 1
+HISTORY_BLOCK_BUDGET = 200000
+
+
+def block_count_text(verb, count):
+    return f"{verb} Block" if count == 1 else f"{verb} {count} Blocks"
+
+
+def batched(model, count):
+    return model.batch() if count > 1 else nullcontext()
+
+
+def push_command(stack, command, budget=HISTORY_BLOCK_BUDGET):
+    stack.push(command)
+    if stack.index() != stack.count():
+        return
+    commands = [stack.command(index) for index in range(stack.count())]
+    if sum(command.size() for command in commands) <= budget:
+        return
+
+    keep = len(commands) - 1
+    kept_size = commands[keep].size()
+    while keep > 0 and kept_size + commands[keep - 1].size() <= budget // 2:
+        keep -= 1
+        kept_size += commands[keep].size()
+    if keep == 0:
+        return
+    kept = [command.replay() for command in commands[keep:]]
+    stack.clear()
+    for command in kept:
+        stack.push(command)
+
+
+class BlockCommand(QUndoCommand):
+    def __init__(self, text):
+        super().__init__(text)
+        self.replaying = False
+
+    def redo(self):
+        if self.replaying:
+            self.replaying = False
+            return
+        self.apply()
+
+    def size(self):
+        return 1
+
+    def replay(self):
+        command = type(self).__new__(type(self))
+        BlockCommand.__init__(command, self.text())
+        state = dict(self.__dict__)
+        state["replaying"] = True
+        command.__dict__.update(state)
+        return command
+
+
+class AddBlocksCommand(BlockCommand):
+    def __init__(self, model, records, verb="Add"):
+        super().__init__(block_count_text(verb, len(records)))
+        self.model = model
+        self.records = records
+
+    def size(self):
+        return len(self.records)
+
+    def apply(self):
+        with batched(self.model, len(self.records)):
+            self.model.add_records(self.records)
+
+    def undo(self):
+        with batched(self.model, len(self.records)):
+            self.model.remove_blocks([record[0] for record in reversed(self.records)])
+
+
+class RemoveBlocksCommand(BlockCommand):
+    def __init__(self, model, node_ids):
+        super().__init__(block_count_text("Delete", len(node_ids)))
+        self.model = model
+        self.records = model.records(node_ids)
+
+    def size(self):
+        return len(self.records)
+
+    def apply(self):
+        with batched(self.model, len(self.records)):
+            self.model.remove_blocks([record[0] for record in self.records])
+
+    def undo(self):
+        with batched(self.model, len(self.records)):
+            self.model.add_records(self.records)
+
+
+class MoveBlocksCommand(BlockCommand):
+    def __init__(self, model, moves, serial):
+        super().__init__(block_count_text("Move", len(moves)))
+        self.model = model
+        self.moves = moves
+        self.serial = serial
+
+    def size(self):
+        return len(self.moves)
+
+    def id(self):
+        return MOVE_COMMAND_ID
+
+    def mergeWith(self, other):
+        if other.serial != self.serial:
+            return False
+        for node_id, (old_x, old_y, x, y) in other.moves.items():
+            previous = self.moves.get(node_id)
+            if previous is not None:
+                old_x, old_y = previous[0], previous[1]
+            self.moves[node_id] = (old_x, old_y, x, y)
+        self.setText(block_count_text("Move", len(self.moves)))
+        return True
+
+    def apply(self):
+        with batched(self.model, len(self.moves)):
+            for node_id, (_, _, x, y) in self.moves.items():
+                self.model.move_block(node_id, x, y)
+
+    def undo(self):
+        with batched(self.model, len(self.moves)):
+            for node_id, (x, y, _, _) in self.moves.items():
+                self.model.move_block(node_id, x, y)
+
+
+class SetArgsCommand(BlockCommand):
+    def __init__(self, model, node_id, args):
+        super().__init__("Edit Block")
+        self.model = model
+        self.node_id = node_id
+        self.old_args = model[node_id].args
+        self.args = tuple(args)
+
+    def apply(self):
+        self.model.set_args(self.node_id, self.args)
+
+    def undo(self):
+        self.model.set_args(self.node_id, self.old_args)
@@ -0,0 +1,318 @@
+import ast
+import copy
+import marshal
+import os
+import struct
+import sys
+import time
+from collections import OrderedDict
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_MEMORY_LIMIT_MB = 512
+SOURCE_NAME = "<visuallang>"
+DONE_MARKER = "\x1eVL-DONE"
+SESSION_TOKEN_VARIABLE = "VISUALLANG_SESSION_TOKEN"
+FRAME_HEADER = struct.Struct(">I")
+
+
+class CompileCache:
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, source, first_line=1, optimize=False, vectorize=False):
+        import hashlib
+        digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        flags = ("O" if optimize else "") + ("V" if vectorize else "")
+        return f"{digest}:{first_line}:{flags}" if flags else f"{digest}:{first_line}"
+
+    def compile(self, source, first_line=1, tree=None, optimize=False, vectorize=False):
+        key = self.key(source, first_line, optimize, vectorize)
+        code = self._entries.get(key)
+        if code is not None:
+            self._entries.move_to_end(key)
+            return key, code
+
+        if tree is None:
+            tree = ast.parse(source, SOURCE_NAME)
+            ast.increment_lineno(tree, first_line - 1)
+        if optimize:
+            from optimizer import optimize as optimize_module
+            tree = optimize_module(tree)
+        if vectorize:
+            from vectorize import vectorize as vectorize_module
+            tree = vectorize_module(tree)
+        code = compile(tree, SOURCE_NAME, "exec")
+        self._entries[key] = code
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return key, code
+
+
+def compile_segments(cache, segments, trees=None, optimize=False, vectorize=False):
+    trees = trees or [None] * len(segments)
+    return [cache.compile(source, first_line, tree, optimize, vectorize)
+            for (first_line, source), tree in zip(segments, trees)]
+
+
+def worker_command(timeout=DEFAULT_TIMEOUT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, session=False, profile=None):
+    command = [sys.executable, "-u", os.path.abspath(__file__),
+               "--cpu-limit", str(int(timeout)), "--memory-limit", str(int(memory_limit_mb))]
+    if session:
+        command.append("--session")
+    if profile is not None:
+        command.extend(["--profile", profile])
+    return command
+
+
+def worker_environment(environ=None, session_token=None):
+    env = dict(os.environ if environ is None else environ)
+    env["PYTHONIOENCODING"] = "utf-8"
+    env["PYTHONUNBUFFERED"] = "1"
+    if session_token is not None:
+        env[SESSION_TOKEN_VARIABLE] = session_token
+    return env
+
+
+def parse_done_marker(line, token):
+    fields = line[len(DONE_MARKER):].split()
+    if not line.startswith(DONE_MARKER) or len(fields) != 3 or fields[0] != token:
+        return None
+    try:
+        return int(fields[1]), int(fields[2])
+    except ValueError:
+        return None
+
+
+def encode_request(segments):
+    data = marshal.dumps([(key, code) for key, code in segments])
+    return FRAME_HEADER.pack(len(data)) + data
+
+
+def run_program(segments, timeout=DEFAULT_TIMEOUT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+    import subprocess
+    try:
+        result = subprocess.run(worker_command(timeout, memory_limit_mb), input=encode_request(segments),
+                                capture_output=True, env=worker_environment(), timeout=timeout)
+    except subprocess.TimeoutExpired as e:
+        return None, _decode(e.stdout), _decode(e.stderr)
+    return result.returncode, _decode(result.stdout), _decode(result.stderr)
+
+
+def _decode(data):
+    return (data or b"").decode("utf-8", "replace").replace("\r\n", "\n")
+
+
+def read_request(stream):
+    header = stream.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    return marshal.loads(stream.read(size))
+
+
+def set_limit(resource, kind, soft, hard):
+    current = resource.getrlimit(kind)[1]
+    if current != resource.RLIM_INFINITY:
+        soft = min(soft, current)
+        hard = current if hard == resource.RLIM_INFINITY else min(hard, current)
+    try:
+        resource.setrlimit(kind, (soft, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def apply_memory_limit(memory_limit_mb):
+    try:
+        import resource
+    except ImportError:
+        return
+    if memory_limit_mb > 0:
+        limit = memory_limit_mb * 1024 * 1024
+        set_limit(resource, resource.RLIMIT_AS, limit, limit)
+
+
+def apply_cpu_budget(cpu_seconds, hard=False):
+    try:
+        import resource
+    except ImportError:
+        return
+    if cpu_seconds <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+    limit = soft + 1 if hard else resource.RLIM_INFINITY
+    set_limit(resource, resource.RLIMIT_CPU, soft, limit)
+
+
+def format_error(error):
+    import traceback
+    tb = error.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename != SOURCE_NAME:
+        tb = tb.tb_next
+    details = "".join(traceback.format_exception(type(error), error, tb))
+    return f"Error: {error}\n{details}"
+
+
+def execute(code, namespace):
+    try:
+        exec(code, namespace)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 0
+    except BaseException as e:
+        sys.stdout.flush()
+        sys.stderr.write(format_error(e))
+        sys.stderr.flush()
+        return 1
+    return 0
+
+
+def copy_namespace(namespace):
+    copied = {}
+    memo = {}
+    for name, value in namespace.items():
+        if name.startswith("__"):
+            copied[name] = value
+            continue
+        try:
+            copied[name] = copy.deepcopy(value, memo)
+        except Exception:
+            copied[name] = value
+    return copied
+
+
+class Session:
+    CHECKPOINT_INTERVAL = 0.05
+    CHECKPOINT_COST_RATIO = 4
+    MAX_CHECKPOINTS = 8
+
+    def __init__(self):
+        self.namespace = {"__name__": "__main__"}
+        self.history = []
+        self.checkpoints = []
+        self.copy_cost = 0.0
+
+    def checkpoint(self):
+        started = time.perf_counter()
+        self.checkpoints.append((len(self.history), copy_namespace(self.namespace)))
+        self.copy_cost = time.perf_counter() - started
+        if len(self.checkpoints) > self.MAX_CHECKPOINTS:
+            del self.checkpoints[0]
+
+    def restore(self, snapshot):
+        self.namespace.clear()
+        if snapshot is None:
+            self.namespace["__name__"] = "__main__"
+        else:
+            self.namespace.update(copy_namespace(snapshot))
+
+    def run(self, segments):
+        keys = [key for key, _ in segments]
+        common = 0
+        limit = min(len(keys), len(self.history))
+        while common < limit and keys[common] == self.history[common]:
+            common += 1
+
+        self.checkpoints = [checkpoint for checkpoint in self.checkpoints if checkpoint[0] <= common]
+        start, snapshot = self.checkpoints[-1] if self.checkpoints else (0, None)
+        self.restore(snapshot)
+        self.history = keys[:start]
+
+        elapsed = 0.0
+        for position in range(start, len(segments)):
+            key, code = segments[position]
+            started = time.perf_counter()
+            status = execute(code, self.namespace)
+            elapsed += time.perf_counter() - started
+            if status != 0:
+                return start, status
+            self.history.append(key)
+            threshold = self.CHECKPOINT_COST_RATIO * self.copy_cost
+            if elapsed >= max(threshold, self.CHECKPOINT_INTERVAL) or (position == len(segments) - 1 and
+                                                                       elapsed >= threshold):
+                self.checkpoint()
+                elapsed = 0.0
+        return start, 0
+
+
+def run_once(stdin, cpu_limit, profiler=None):
+    segments = read_request(stdin)
+    if segments is None:
+        return 0
+    apply_cpu_budget(cpu_limit, hard=True)
+    if profiler is not None:
+        profiler.start()
+    namespace = {"__name__": "__main__"}
+    for _, code in segments:
+        status = execute(code, namespace)
+        if status != 0:
+            return status
+    return 0
+
+
+def run_profiled(stdin, cpu_limit, path):
+    import signal
+    from profiler import LineProfiler
+    profiler = LineProfiler(SOURCE_NAME)
+
+    def save_and_exit(signum, frame):
+        profiler.stop()
+        profiler.write(path)
+        sys.stdout.flush()
+        os._exit(128 + signum)
+
+    for name in ("SIGTERM", "SIGXCPU"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), save_and_exit)
+    try:
+        return run_once(stdin, cpu_limit, profiler)
+    finally:
+        profiler.stop()
+        profiler.write(path)
+
+
+def run_session(stdin, cpu_limit):
+    token = os.environ.pop(SESSION_TOKEN_VARIABLE, "")
+    requests = os.fdopen(os.dup(stdin.fileno()), "rb")
+    replies = os.dup(sys.__stdout__.fileno())
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, stdin.fileno())
+    os.close(devnull)
+
+    session = Session()
+    while True:
+        segments = read_request(requests)
+        if segments is None:
+            return 0
+        apply_cpu_budget(cpu_limit)
+        skipped, status = session.run(segments)
+        for stream in (sys.__stdout__, sys.__stderr__):
+            try:
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+        os.write(replies, f"{DONE_MARKER} {token} {status} {skipped}\n".encode("utf-8"))
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a generated VisualLang program.")
+    parser.add_argument("--cpu-limit", type=int, default=DEFAULT_TIMEOUT)
+    parser.add_argument("--memory-limit", type=int, default=DEFAULT_MEMORY_LIMIT_MB)
+    parser.add_argument("--session", action="store_true")
+    parser.add_argument("--profile", metavar="PATH")
+    args = parser.parse_args(argv)
+
+    apply_memory_limit(args.memory_limit)
+    if args.session:
+        return run_session(sys.stdin.buffer, args.cpu_limit)
+    if args.profile:
+        return run_profiled(sys.stdin.buffer, args.cpu_limit, args.profile)
+    return run_once(sys.stdin.buffer, args.cpu_limit)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
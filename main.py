@@ -1,11 +1,27 @@
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QPushButton, QLabel, QHBoxLayout, QGraphicsView,
-                               QGraphicsScene, QGraphicsItem, QTextEdit, QListWidget, QListWidgetItem, QInputDialog, QMenu, QTabWidget)
-from PySide6.QtCore import Qt, QRectF
-from PySide6.QtGui import QColor, QPen
+                               QGraphicsScene, QGraphicsItem, QTextEdit, QListWidget, QListWidgetItem, QInputDialog, QMenu, QTabWidget, QCheckBox,
+                               QFileDialog, QMessageBox, QStyle)
+from PySide6.QtCore import Qt, QRectF, QPointF, QObject, QProcess, QProcessEnvironment, QTimer, QMimeData, Signal
+from PySide6.QtGui import (QColor, QPen, QFont, QKeySequence, QStaticText, QTransform, QTextCursor, QTextCharFormat,
+                           QUndoStack, QCursor)
+import os
 import sys
-import io
-from contextlib import redirect_stdout
-import traceback
+import time
+import codecs
+import re
+from collections import deque
+from model import VERTICAL_SPACING, VERTICAL_TOLERANCE, INDENT_THRESHOLD, BlockModel
+from executor import (DEFAULT_TIMEOUT, DEFAULT_MEMORY_LIMIT_MB, DONE_MARKER, SOURCE_NAME, CompileCache,
+                      compile_segments, encode_request, parse_done_marker, worker_command,
+                      worker_environment)
+from codegen import BlockGraph, CodeGenerator, preview_links
+from registry import BLOCK_TYPES, ArgumentError, categories, default_args, get_spec
+from commands import AddBlocksCommand, MoveBlocksCommand, RemoveBlocksCommand, SetArgsCommand, push_command
+from project import ProjectError, dumps_blocks, loads_blocks, load_program, save_program, save_json
+
+PROJECT_FILTER = "VisualLang Projects (*.vlp);;JSON (*.json);;All Files (*)"
+CLIPBOARD_FORMAT = "application/x-visuallang-blocks"
+STARTUP_PROBE = "--startup-probe"
 
 COLORS = {
     "bg_primary": "#1a1b26",
@@ -16,267 +32,990 @@ COLORS = {
     "text_secondary": "#a9b1d6",
     "error": "#f7768e",
     "success": "#9ece6a",
-    "block_colors": {
-        "Print": QColor("#bb9af7"),
-        "Variable": QColor("#7dcfff"),
-        "Loop": QColor("#ff9e64"),
-        "Condition": QColor("#9ece6a"),
-        "WhileLoop": QColor("#f7768e"),
-        "Addition": QColor("#73daca"),
-        "Subtraction": QColor("#ff7a93"),
-        "Multiplication": QColor("#b4f9f0"),
-        "Division": QColor("#ffa656"),
-        "Rounding": QColor("#c0caf5"),
-        "Modulo": QColor("#ff9e64"),
-        "Exponentiation": QColor("#73daca"),
-        "SquareRoot": QColor("#7dcfff"),
-        "AbsoluteValue": QColor("#9ece6a"),
-        "MinMax": QColor("#ff9e64"),
-        "Function": QColor("#bb9af7"),
-        "Return": QColor("#f7768e"),
-        "Break": QColor("#ff7a93"),
-        "Continue": QColor("#ffa656"),
-        "ListCreate": QColor("#b4f9f0"),
-        "StringConvert": QColor("#73daca"),
-        "IntConvert": QColor("#7dcfff"),
-        "FloatConvert": QColor("#9ece6a"),
-        "TypeCheck": QColor("#ff7a93"),
-        "StringConcat": QColor("#bb9af7"),
-        "StringSplit": QColor("#b4f9f0"),
-        "StringFormat": QColor("#7aa2f7")
-    }
+    "block_colors": {name: QColor(spec.color) for name, spec in BLOCK_TYPES.items()}
 }
 
+STYLE_SHEET = f"""
+    QMainWindow {{
+        background-color: {COLORS['bg_primary']};
+    }}
+    QWidget {{
+        background-color: {COLORS['bg_primary']};
+        color: {COLORS['text_primary']};
+        font-family: 'Segoe UI', sans-serif;
+    }}
+    QPushButton {{
+        background-color: {COLORS['accent']};
+        color: {COLORS['bg_primary']};
+        border: none;
+        border-radius: 5px;
+        padding: 8px 15px;
+        font-weight: bold;
+    }}
+    QPushButton:hover {{
+        background-color: {COLORS['text_primary']};
+    }}
+    QLabel {{
+        color: {COLORS['text_secondary']};
+        font-size: 11pt;
+        font-weight: bold;
+        margin-bottom: 5px;
+    }}
+    QListWidget {{
+        background-color: {COLORS['bg_secondary']};
+        border: none;
+        border-radius: 8px;
+        padding: 5px;
+    }}
+    QListWidget::item {{
+        padding: 8px;
+        margin: 2px;
+        border-radius: 4px;
+    }}
+    QListWidget::item:selected {{
+        background-color: {COLORS['accent']};
+        color: {COLORS['bg_primary']};
+    }}
+    QGraphicsView {{
+        background-color: {COLORS['bg_secondary']};
+        border: none;
+        border-radius: 8px;
+        margin: 5px;
+    }}
+    QTextEdit {{
+        background-color: {COLORS['bg_tertiary']};
+        color: {COLORS['text_primary']};
+        border: none;
+        border-radius: 8px;
+        padding: 10px;
+        font-family: 'Consolas', 'Monaco', monospace;
+        font-size: 11pt;
+    }}
+"""
+
 class Block(QGraphicsItem):
     COLOR_MAP = COLORS["block_colors"]
-    VERTICAL_SPACING = 60
-    VERTICAL_TOLERANCE = 20
-    INDENT_THRESHOLD = 20
+    VERTICAL_SPACING = VERTICAL_SPACING
+    VERTICAL_TOLERANCE = VERTICAL_TOLERANCE
+    INDENT_THRESHOLD = INDENT_THRESHOLD
+    RECT = QRectF(0, 0, 160, 45)
+    BOUNDS = RECT.adjusted(-5, -5, 5, 5)
+    DEFAULT_COLOR = QColor(211, 211, 211)
+    BORDER_PEN = QPen(Qt.black, 0)
+    SELECTED_PEN = QPen(QColor(COLORS["accent"]), 3)
+    TEXT_PEN = QPen(QColor("#1a1b26"))
+    TEXT_FONT = None
+    HEAT_COLOR = QColor(COLORS["error"])
+    TEXT_LOD = 0.45
 
-    def __init__(self, block_type="Block", parent=None):
+    def __init__(self, node, parent=None):
         super().__init__(parent)
-        self.block_type = block_type
-        self.text = self.get_initial_text()
-        self.setFlags(QGraphicsItem.ItemIsMovable | QGraphicsItem.ItemIsSelectable)
-        self.rect = QRectF(0, 0, 160, 45)
-        self.nested_blocks = []
-        self.parent_block = None
+        self.node = node
+        self.color = self.COLOR_MAP.get(node.block_type, self.DEFAULT_COLOR)
+        self.static_text = None
+        self.text_origin = None
+        self.heat_color = None
+        self.setFlags(QGraphicsItem.ItemIsMovable | QGraphicsItem.ItemIsSelectable |
+                      QGraphicsItem.ItemIsFocusable | QGraphicsItem.ItemSendsGeometryChanges)
+        self.setAcceptedMouseButtons(Qt.LeftButton | Qt.RightButton)
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        self.setPos(node.x, node.y)
+
+    @property
+    def block_type(self):
+        return self.node.block_type
+
+    @property
+    def text(self):
+        return self.node.text
+
+    def text_changed(self):
+        self.static_text = None
+        self.update()
+
+    def set_heat(self, heat, tooltip):
+        if heat is None:
+            self.heat_color = None
+        else:
+            self.heat_color = QColor(self.HEAT_COLOR)
+            self.heat_color.setAlphaF(0.15 + 0.65 * heat)
+        self.setToolTip(tooltip)
+        self.update()
 
     def mousePressEvent(self, event):
         if event.button() == Qt.RightButton:
+            scene = self.scene()
+            targets = scene.selected_ids() if self.isSelected() else [self.node.id]
             menu = QMenu()
-            delete_action = menu.addAction("Delete Block")
+            duplicate_action = menu.addAction("Duplicate")
+            delete_action = menu.addAction("Delete Block" if len(targets) == 1 else f"Delete {len(targets)} Blocks")
 
             scene_pos = event.scenePos()
-            view = self.scene().views()[0]
+            view = scene.views()[0]
             screen_pos = view.mapToGlobal(view.mapFromScene(scene_pos))
 
             action = menu.exec(screen_pos)
             if action == delete_action:
-                for nested in self.nested_blocks:
-                    nested.scene().removeItem(nested)
-                if self.parent_block:
-                    self.parent_block.nested_blocks.remove(self)
-                self.scene().removeItem(self)
+                scene.delete_blocks(targets)
+            elif action == duplicate_action:
+                scene.duplicate_blocks(targets)
         else:
             super().mousePressEvent(event)
 
-    def get_initial_text(self):
-        initial_texts = {
-            "Print": "Print: 'Hello World'",
-            "Variable": "Variable: x = 10",
-            "Loop": "Loop: range(5)",
-            "Condition": "Condition: x > 5",
-            "WhileLoop": "WhileLoop: x < 10",
-            "Addition": "Addition: x, y",
-            "Subtraction": "Subtraction: x, y",
-            "Multiplication": "Multiplication: x, y",
-            "Division": "Division: x, y",
-            "Rounding": "Rounding: x, 2",
-            "Modulo": "Modulo: x, y",
-            "Exponentiation": "Exponentiation: result, x, y",
-            "SquareRoot": "SquareRoot: result, x",
-            "AbsoluteValue": "AbsoluteValue: result, x",
-            "MinMax": "MinMax: result, x, y",
-            "Function": "Function: my_function(param1, param2)",
-            "Return": "Return: value",
-            "Break": "Break: in_loop",
-            "Continue": "Continue: in_loop",
-            "ListCreate": "ListCreate: my_list, [1, 2, 3]",
-            "DictCreate": "DictCreate: my_dict, {'key': 'value'}",
-            "ListAppend": "ListAppend: my_list, new_item",
-            "Comprehension": "Comprehension: result, [x for x in range(10)]",
-            "StringConvert": "StringConvert: result, x",
-            "IntConvert": "IntConvert: result, x",
-            "FloatConvert": "FloatConvert: result, x",
-            "TypeCheck": "TypeCheck: result, x",
-            "StringConcat": "StringConcat: result, str1, str2",
-            "StringSplit": "StringSplit: result, string, delimiter",
-            "StringFormat": "StringFormat: result, template, values",
-            "StringLength": "StringLength: result, string"
-        }
-        return initial_texts.get(self.block_type, self.block_type)
+    def mouseDoubleClickEvent(self, event):
+        self.edit_block()
+
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        scene = self.scene()
+        if isinstance(scene, BlockScene):
+            scene.clear_preview()
+
+    def itemChange(self, change, value):
+        scene = self.scene()
+        if not isinstance(scene, BlockScene):
+            return super().itemChange(change, value)
+        if (change == QGraphicsItem.ItemPositionChange and scene.snap_to_grid and
+                scene.mouseGrabberItem() is not None):
+            value = scene.snapped(value)
+        elif change == QGraphicsItem.ItemPositionHasChanged:
+            node = self.node
+            if scene.mouseGrabberItem() is None:
+                scene.model.move_block(node.id, value.x(), value.y())
+            elif node.x != value.x() or node.y != value.y():
+                moves = {node.id: (node.x, node.y, value.x(), value.y())}
+                push_command(scene.undo_stack, MoveBlocksCommand(scene.model, moves, scene.drag_serial))
+            if scene.mouseGrabberItem() is self:
+                scene.update_preview(node.id)
+        return super().itemChange(change, value)
+
+    @classmethod
+    def text_font(cls, painter):
+        if cls.TEXT_FONT is None:
+            font = QFont(painter.font())
+            font.setPointSize(10)
+            font.setFamily("Segoe UI")
+            cls.TEXT_FONT = font
+        return cls.TEXT_FONT
+
+    def layout_text(self, font):
+        static_text = QStaticText(self.node.text)
+        static_text.setTextFormat(Qt.PlainText)
+        static_text.setPerformanceHint(QStaticText.AggressiveCaching)
+        static_text.prepare(QTransform(), font)
+        size = static_text.size()
+        self.text_origin = QPointF(self.RECT.center().x() - size.width() / 2,
+                                   self.RECT.center().y() - size.height() / 2)
+        self.static_text = static_text
 
     def boundingRect(self) -> QRectF:
-        return self.rect.adjusted(-5, -5, 5, 5)
+        return self.BOUNDS
 
     def paint(self, painter, option, widget=None):
-        color = self.COLOR_MAP.get(self.block_type, QColor(211, 211, 211))
-        painter.setBrush(color)
-        painter.setPen(QPen(Qt.black, 0))
-        painter.drawRoundedRect(self.rect, 10, 10)
-
-        painter.setPen(QPen(QColor("#1a1b26")))
-        font = painter.font()
-        font.setPointSize(10)
-        font.setFamily("Segoe UI")
+        if option.levelOfDetailFromTransform(painter.worldTransform()) < self.TEXT_LOD:
+            painter.fillRect(self.RECT, self.heat_color or self.color)
+            return
+
+        painter.setBrush(self.color)
+        painter.setPen(self.SELECTED_PEN if option.state & QStyle.State_Selected else self.BORDER_PEN)
+        painter.drawRoundedRect(self.RECT, 10, 10)
+        if self.heat_color is not None:
+            painter.setBrush(self.heat_color)
+            painter.drawRoundedRect(self.RECT, 10, 10)
+
+        font = self.text_font(painter)
+        if self.static_text is None:
+            self.layout_text(font)
+        painter.setPen(self.TEXT_PEN)
         painter.setFont(font)
-        painter.drawText(self.rect, Qt.AlignCenter, self.text)
+        painter.drawStaticText(self.text_origin, self.static_text)
 
     def edit_block(self):
-        edit_prompts = {
-            "Print": ("Edit Print Block", "Enter text to print:", "Hello World", False),
-            "Variable": ("Edit Variable Block", "Enter variable and value (e.g., x = 10):", "x = 10", False),
-            "Loop": ("Edit Loop Block", "Enter range (e.g., 5):", "5", False),
-            "Condition": ("Edit Condition Block", "Enter condition (e.g., x > 5):", "x > 5", False),
-            "WhileLoop": ("Edit While Loop Block", "Enter while condition (e.g., x < 10):", "x < 10", False),
-            "Addition": ("Edit Addition Block", "Enter first value/variable:", "x", True),
-            "Subtraction": ("Edit Subtraction Block", "Enter first value/variable:", "x", True),
-            "Multiplication": ("Edit Multiplication Block", "Enter first value/variable:", "x", True),
-            "Division": ("Edit Division Block", "Enter first value/variable:", "x", True),
-            "Rounding": ("Edit Rounding Block", "Enter variable to round:", "x", True),
-            "Modulo": ("Edit Modulo Block", "Enter first value/variable:", "x", True),
-            "Exponentiation": ("Edit Exponentiation Block", "Enter first value/variable:", "x", True),
-            "Square Root": ("Edit Square Root Block", "Enter variable to square root:", "x", True),
-            "Absolute Value": ("Edit Absolute Value Block", "Enter variable:", "x", True),
-            "Min/Max": ("Edit Min/Max Block", "Enter first value/variable:", "x", True),
-            "Function": ("Edit Function Block", "Enter function definition:", "def my_function(param1, param2):", False),
-            "Return": ("Edit Return Block", "Enter return value:", "result", False),
-            "Break": ("Edit Break Block", "Enter context:", "", False),
-            "Continue": ("Edit Continue Block", "Enter context:", "", False),
-            "ListCreate": ("Edit List Creation Block", "Enter list values:", "[1, 2, 3]", True),
-            "StringConvert": ("Edit String Conversion Block", "Enter variable to convert:", "x", True),
-            "IntConvert": ("Edit Integer Conversion Block", "Enter variable to convert:", "x", True),
-            "FloatConvert": ("Edit Float Conversion Block", "Enter variable to convert:", "x", True),
-            "TypeCheck": ("Edit Type Check Block", "Enter variable to check:", "x", True),
-            "StringConcat": ("Edit String Concatenation Block", "Enter first string:", "str1", True),
-            "StringSplit": ("Edit String Split Block", "Enter string to split:", "string", True),
-            "StringFormat": ("Edit String Format Block", "Enter format template:", "'{} {}'", True)
-        }
+        spec = get_spec(self.block_type)
+        if spec is None or not spec.fields:
+            return
 
-        title, prompt1, default1, needs_var = edit_prompts.get(self.block_type, ("Edit Block", "Enter first value:", "", False))
-        
-        if needs_var:
-            var_title = f"Edit {self.block_type} Result Variable"
-            var_prompt = "Enter the variable to save result:"
-            var_default = "result"
-            var_name, var_ok = QInputDialog.getText(None, var_title, var_prompt, text=var_default)
-            
-            if not var_ok:
+        values = list(self.node.args) if len(self.node.args) == len(spec.fields) else list(spec.defaults)
+        title = f"Edit {spec.label} Block"
+        index = 0
+        while index < len(spec.fields):
+            value, ok = QInputDialog.getText(None, title, spec.fields[index].prompt, text=values[index])
+            if not ok:
                 return
+            values[index] = value.strip()
+            index += 1
+            if index == len(spec.fields):
+                try:
+                    args = spec.validate(values)
+                except ArgumentError as e:
+                    QMessageBox.warning(None, title, str(e))
+                    index = e.field or 0
 
-            first_title = title
-            first_prompt = prompt1
-            first_value, first_ok = QInputDialog.getText(None, first_title, first_prompt, text=default1)
-            
-            if not first_ok:
-                return
+        scene = self.scene()
+        push_command(scene.undo_stack, SetArgsCommand(scene.model, self.node.id, args))
+
+class BlockScene(QGraphicsScene):
+    POPULATE_MARGIN = 200
+    GRID_X = 50
+    GRID_Y = VERTICAL_SPACING // 2
+    PARENT_PEN = QPen(QColor(COLORS["accent"]), 3, Qt.DashLine)
+    LINK_PEN = QPen(QColor(COLORS["success"]), 3, Qt.DashLine)
+    GROW_MARGIN = 500
+    BSP_ITEMS_PER_LEAF = 16
+    MIN_BSP_DEPTH = 5
+    MAX_BSP_DEPTH = 12
+
+    def __init__(self, model, *args, lazy=False, undo_stack=None):
+        super().__init__(*args)
+        self.model = model
+        self.undo_stack = undo_stack if undo_stack is not None else QUndoStack(self)
+        self.drag_serial = 0
+        self.block_items = {}
+        self.lazy = lazy
+        self.visible_bounds = None
+        self.overview = False
+        self.overview_groups = None
+        self.heatmap = {}
+        self.snap_to_grid = True
+        self.preview = ()
+        model.add_listener(self)
+        self.tune_index()
+        for node in model:
+            self.block_added(node)
+
+    def tune_index(self):
+        leaves = len(self.model) // self.BSP_ITEMS_PER_LEAF
+        self.setBspTreeDepth(min(self.MAX_BSP_DEPTH, max(self.MIN_BSP_DEPTH, leaves.bit_length())))
+
+    def is_visible(self, node):
+        if not self.lazy:
+            return True
+        if self.visible_bounds is None or self.overview:
+            return False
+        left, top, right, bottom = self.visible_bounds
+        return (node.x + Block.RECT.width() >= left and node.x <= right and
+                node.y + Block.RECT.height() >= top and node.y <= bottom)
 
-            second_prompt = "Enter second value/variable:" if self.block_type != "Rounding" else "Enter decimal places:"
-            second_default = "y" if self.block_type != "Rounding" else "2"
-            second_value, second_ok = QInputDialog.getText(None, title, second_prompt, text=second_default)
-            
-            if second_ok:
-                self.text = f"{self.block_type}: {var_name}, {first_value}, {second_value}"
+    def set_visible_rect(self, rect, overview=False):
+        margin = self.POPULATE_MARGIN
+        self.visible_bounds = (rect.left() - margin, rect.top() - margin,
+                               rect.right() + margin, rect.bottom() + margin)
+        if overview != self.overview:
+            self.overview = overview
+            self.update()
+        self.populate()
+
+    def populate(self):
+        if self.visible_bounds is None or self.overview:
+            return
+        left, top, right, bottom = self.visible_bounds
+        nodes = self.model.nodes
+        for node_id in self.model.index.query(left - Block.RECT.width(), top - Block.RECT.height(), right, bottom):
+            if node_id not in self.block_items:
+                self.create_item(nodes[node_id])
+
+    def model_bounds(self):
+        if not len(self.model):
+            return None
+        xs = [node.x for node in self.model]
+        ys = [node.y for node in self.model]
+        return QRectF(min(xs), min(ys), max(xs) - min(xs) + Block.RECT.width(),
+                      max(ys) - min(ys) + Block.RECT.height())
+
+    def fit_to_model(self):
+        rect = QRectF(0, 0, 2000, 1500)
+        bounds = self.model_bounds()
+        if bounds is not None:
+            margin = self.POPULATE_MARGIN
+            rect = rect.united(bounds.adjusted(-margin, -margin, margin, margin))
+        self.setSceneRect(rect)
+        self.tune_index()
+
+    def grow_to(self, node):
+        rect = self.sceneRect()
+        if (node.x >= rect.left() and node.y >= rect.top() and node.x + Block.RECT.width() <= rect.right() and
+                node.y + Block.RECT.height() <= rect.bottom()):
+            return
+        margin = self.GROW_MARGIN
+        self.setSceneRect(rect.united(QRectF(node.x - margin, node.y - margin, Block.RECT.width() + 2 * margin,
+                                             Block.RECT.height() + 2 * margin)))
+
+    def snapped(self, point):
+        return QPointF(round(point.x() / self.GRID_X) * self.GRID_X, round(point.y() / self.GRID_Y) * self.GRID_Y)
+
+    def preview_rect(self, node_id):
+        node = self.model[node_id]
+        return QRectF(node.x, node.y, Block.RECT.width(), Block.RECT.height()).adjusted(-6, -6, 6, 6)
+
+    def set_preview(self, preview):
+        if preview == self.preview:
+            return
+        for node_id, _ in self.preview + preview:
+            if node_id in self.model:
+                self.update(self.preview_rect(node_id))
+        self.preview = preview
+
+    def update_preview(self, node_id):
+        parent, predecessor, successor = preview_links(self.model, node_id)
+        self.set_preview(tuple((link_id, pen) for link_id, pen in
+                               ((parent, self.PARENT_PEN), (predecessor, self.LINK_PEN), (successor, self.LINK_PEN))
+                               if link_id is not None))
+
+    def clear_preview(self):
+        self.set_preview(())
+
+    def drawForeground(self, painter, rect):
+        super().drawForeground(painter, rect)
+        painter.setBrush(Qt.NoBrush)
+        for node_id, pen in self.preview:
+            if node_id in self.model:
+                painter.setPen(pen)
+                painter.drawRoundedRect(self.preview_rect(node_id).adjusted(2, 2, -2, -2), 12, 12)
+
+    def drawBackground(self, painter, rect):
+        super().drawBackground(painter, rect)
+        if not self.overview:
+            return
+        if self.overview_groups is None:
+            width, height = Block.RECT.width(), Block.RECT.height()
+            groups = {}
+            for node in self.model:
+                if node.id not in self.block_items:
+                    groups.setdefault(node.block_type, []).append(QRectF(node.x, node.y, width, height))
+            self.overview_groups = groups
+        painter.setPen(Qt.NoPen)
+        for block_type, rects in self.overview_groups.items():
+            painter.setBrush(Block.COLOR_MAP.get(block_type, Block.DEFAULT_COLOR))
+            painter.drawRects(rects)
+
+    def create_item(self, node):
+        self.overview_groups = None
+        block = Block(node)
+        if node.id in self.heatmap:
+            block.set_heat(*self.heatmap[node.id])
+        self.block_items[node.id] = block
+        self.addItem(block)
+        return block
+
+    def block_added(self, node):
+        self.overview_groups = None
+        self.grow_to(node)
+        if self.is_visible(node):
+            self.create_item(node)
+        elif self.overview:
+            self.update(node.x, node.y, Block.RECT.width(), Block.RECT.height())
+
+    def block_moved(self, node):
+        self.overview_groups = None
+        self.grow_to(node)
+        block = self.block_items.get(node.id)
+        if block is None:
+            if self.is_visible(node):
+                self.create_item(node)
+            elif self.overview:
+                self.update()
+        elif block.pos().x() != node.x or block.pos().y() != node.y:
+            block.setPos(node.x, node.y)
+
+    def block_changed(self, node):
+        block = self.block_items.get(node.id)
+        if block is not None:
+            block.text_changed()
+
+    def block_removed(self, node):
+        self.overview_groups = None
+        block = self.block_items.pop(node.id, None)
+        if block is not None:
+            self.removeItem(block)
+        elif self.overview:
+            self.update(node.x, node.y, Block.RECT.width(), Block.RECT.height())
+
+    def model_reset(self):
+        for block in self.block_items.values():
+            self.removeItem(block)
+        self.block_items = {}
+        self.overview_groups = None
+        self.heatmap = {}
+        if self.lazy:
+            self.populate()
         else:
-            new_text, ok = QInputDialog.getText(None, title, prompt1, text=default1)
-            
-            if ok:
-                self.text = f"{self.block_type}: {new_text}"
-        
+            for node in self.model:
+                self.create_item(node)
+
+    def reveal_block(self, node_id):
+        block = self.block_items.get(node_id)
+        if block is None:
+            block = self.create_item(self.model[node_id])
+        self.clearSelection()
+        block.setSelected(True)
+        return block
+
+    def set_heatmap(self, heatmap):
+        for node_id in self.heatmap.keys() - heatmap.keys():
+            block = self.block_items.get(node_id)
+            if block is not None:
+                block.set_heat(None, "")
+        self.heatmap = heatmap
+        for node_id, (heat, tooltip) in heatmap.items():
+            block = self.block_items.get(node_id)
+            if block is not None:
+                block.set_heat(heat, tooltip)
+
+    def batch_started(self):
+        self.setItemIndexMethod(QGraphicsScene.NoIndex)
+        for view in self.views():
+            view.viewport().setUpdatesEnabled(False)
+
+    def batch_finished(self):
+        self.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+        self.tune_index()
+        for view in self.views():
+            view.viewport().setUpdatesEnabled(True)
         self.update()
 
+    def mousePressEvent(self, event):
+        self.drag_serial += 1
+        super().mousePressEvent(event)
+
+    def keyPressEvent(self, event):
+        step = {Qt.Key_Left: (-self.GRID_X, 0), Qt.Key_Right: (self.GRID_X, 0),
+                Qt.Key_Up: (0, -self.GRID_Y), Qt.Key_Down: (0, self.GRID_Y)}.get(event.key())
+        if step is not None and self.selectedItems():
+            self.nudge_selection(*step)
+            event.accept()
+            return
+        super().keyPressEvent(event)
+
+    def selected_ids(self):
+        return [item.node.id for item in self.selectedItems() if isinstance(item, Block)]
+
+    def with_subtrees(self, node_ids):
+        graph = BlockGraph(self.model)
+        ids = {}
+        for node_id in node_ids:
+            for subtree_id in graph.subtree(node_id):
+                ids.setdefault(subtree_id, None)
+        return list(ids)
+
+    def select_blocks(self, node_ids):
+        self.clearSelection()
+        for node_id in node_ids:
+            block = self.block_items.get(node_id)
+            if block is not None:
+                block.setSelected(True)
+
+    def select_area(self, rect):
+        nodes = self.model.nodes
+        for node_id in self.model.index.query(rect.left() - Block.RECT.width(), rect.top() - Block.RECT.height(),
+                                              rect.right(), rect.bottom()):
+            block = self.block_items.get(node_id)
+            if block is None:
+                block = self.create_item(nodes[node_id])
+            block.setSelected(True)
+
+    def add_copies(self, records, dx, dy, verb):
+        next_id = self.model.next_id
+        copies = [(next_id + offset, block_type, args, x + dx, y + dy)
+                  for offset, (_, block_type, args, x, y) in enumerate(records)]
+        if copies:
+            push_command(self.undo_stack, AddBlocksCommand(self.model, copies, verb))
+            self.select_blocks([record[0] for record in copies])
+
+    def duplicate_blocks(self, node_ids):
+        self.add_copies(self.model.records(self.with_subtrees(node_ids)), self.GRID_X, self.GRID_Y, "Duplicate")
+
+    def delete_blocks(self, node_ids):
+        node_ids = self.with_subtrees(node_ids)
+        if node_ids:
+            push_command(self.undo_stack, RemoveBlocksCommand(self.model, node_ids))
+
+    def nudge_selection(self, dx, dy):
+        moves = {node_id: (self.model[node_id].x, self.model[node_id].y,
+                           self.model[node_id].x + dx, self.model[node_id].y + dy) for node_id in self.selected_ids()}
+        if moves:
+            self.drag_serial += 1
+            push_command(self.undo_stack, MoveBlocksCommand(self.model, moves, self.drag_serial))
+
+class CanvasView(QGraphicsView):
+    MIN_SCALE = 0.02
+    MAX_SCALE = 4.0
+    ZOOM_STEP = 1.25
+    OVERVIEW_SCALE = 0.2
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setOptimizationFlags(QGraphicsView.DontSavePainterState | QGraphicsView.DontAdjustForAntialiasing)
+        self.setDragMode(QGraphicsView.RubberBandDrag)
+        self.rubber_band_area = None
+        self.rubberBandChanged.connect(self.rubber_band_changed)
+
+    def rubber_band_changed(self, rect, start, end):
+        if not rect.isNull():
+            self.rubber_band_area = QRectF(start, end).normalized()
+            return
+        area, self.rubber_band_area = self.rubber_band_area, None
+        scene = self.scene()
+        if area is not None and isinstance(scene, BlockScene) and scene.overview:
+            scene.select_area(area)
+
+    def drop_position(self, under_cursor=False):
+        point = self.viewport().mapFromGlobal(QCursor.pos())
+        if under_cursor and self.viewport().rect().contains(point):
+            position = self.mapToScene(point)
+        else:
+            position = self.mapToScene(self.viewport().rect().center()) - Block.RECT.center()
+        scene = self.scene()
+        if isinstance(scene, BlockScene) and scene.snap_to_grid:
+            position = scene.snapped(position)
+        return position
+
+    def zoom_scale(self):
+        return self.transform().m11()
+
+    def zoom_by(self, factor):
+        scale = self.zoom_scale()
+        factor = max(self.MIN_SCALE / scale, min(self.MAX_SCALE / scale, factor))
+        self.scale(factor, factor)
+        self.update_visible_rect()
+
+    def reset_zoom(self):
+        self.setTransform(QTransform())
+        self.update_visible_rect()
+
+    def zoom_to_fit(self):
+        scene = self.scene()
+        bounds = scene.model_bounds() if isinstance(scene, BlockScene) else None
+        if bounds is None:
+            self.reset_zoom()
+            return
+        self.fitInView(bounds, Qt.KeepAspectRatio)
+        self.zoom_by(1.0)
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            self.zoom_by(self.ZOOM_STEP ** (event.angleDelta().y() / 120))
+            event.accept()
+        else:
+            super().wheelEvent(event)
+
+    def update_visible_rect(self):
+        scene = self.scene()
+        if isinstance(scene, BlockScene):
+            scene.set_visible_rect(self.mapToScene(self.viewport().rect()).boundingRect(),
+                                   self.zoom_scale() < self.OVERVIEW_SCALE)
+
+    def scrollContentsBy(self, dx, dy):
+        super().scrollContentsBy(dx, dy)
+        self.update_visible_rect()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_visible_rect()
+
 class Terminal(QTextEdit):
+    SCROLLBACK_LINES = 10000
+    FLUSH_INTERVAL_MS = 16
+    SOURCE_LINE = re.compile(rf'File "{re.escape(SOURCE_NAME)}", line (\d+)')
+    line_activated = Signal(int)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setReadOnly(True)
-        self.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: {COLORS['bg_tertiary']};
-                color: {COLORS['text_primary']};
-                border: none;
-                border-radius: 8px;
-                padding: 10px;
-                font-family: 'Consolas', 'Monaco', monospace;
-                font-size: 11pt;
-            }}
-        """)
+        self.viewport().setMouseTracking(True)
+        self.setUndoRedoEnabled(False)
+        self.document().setMaximumBlockCount(self.SCROLLBACK_LINES)
+        self.formats = {}
+        for error, color in ((False, COLORS["text_primary"]), (True, COLORS["error"])):
+            text_format = QTextCharFormat()
+            text_format.setForeground(QColor(color))
+            self.formats[error] = text_format
+        self.link_format = QTextCharFormat(self.formats[True])
+        self.link_format.setAnchor(True)
+        self.link_format.setFontUnderline(True)
+        self.pending = deque(maxlen=self.SCROLLBACK_LINES)
+        self.dropped_lines = 0
+        self.line_open = False
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush)
         self.clear_terminal()
 
     def clear_terminal(self):
-        self.clear()
-        self.append("=== Terminal Output ===\n")
+        self.flush_timer.stop()
+        self.pending.clear()
+        self.dropped_lines = 0
+        self.line_open = False
+        self.setPlainText("=== Terminal Output ===\n\n")
 
     def append_output(self, text, error=False):
-        color = COLORS["error"] if error else COLORS["text_primary"]
-        self.append(f'<span style="color: {color};">{text}</span>')
+        if self.line_open:
+            self.enqueue("\n", error)
+        self.stream_output(text + "\n", error)
+
+    def stream_output(self, text, error=False):
+        for line in text.splitlines(keepends=True):
+            self.enqueue(line, error)
+
+    def enqueue(self, line, error):
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped_lines += 1
+        self.pending.append((line, error))
+        self.line_open = not line.endswith("\n")
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        if not self.pending:
+            return
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.beginEditBlock()
+        if self.dropped_lines:
+            cursor.insertText(f"[... {self.dropped_lines} lines skipped ...]\n", self.formats[True])
+            self.dropped_lines = 0
+
+        run = []
+        run_error = self.pending[0][1]
+        while self.pending:
+            line, error = self.pending.popleft()
+            if error != run_error:
+                self.insert_run(cursor, "".join(run), run_error)
+                run = []
+                run_error = error
+            run.append(line)
+        self.insert_run(cursor, "".join(run), run_error)
+        cursor.endEditBlock()
+
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def insert_run(self, cursor, text, error):
+        position = 0
+        if error:
+            for match in self.SOURCE_LINE.finditer(text):
+                cursor.insertText(text[position:match.start()], self.formats[True])
+                self.link_format.setAnchorHref(match.group(1))
+                cursor.insertText(match.group(), self.link_format)
+                position = match.end()
+        cursor.insertText(text[position:], self.formats[error])
+
+    def mouseMoveEvent(self, event):
+        super().mouseMoveEvent(event)
+        link = self.anchorAt(event.position().toPoint())
+        self.viewport().setCursor(Qt.PointingHandCursor if link else Qt.IBeamCursor)
+
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        link = self.anchorAt(event.position().toPoint())
+        if link and event.button() == Qt.LeftButton and not self.textCursor().hasSelection():
+            self.line_activated.emit(int(link))
+
+class CodeRunner(QObject):
+    KILL_GRACE_MS = 1000
+    output_received = Signal(str, bool)
+    finished = Signal(str, bool)
+    profile_ready = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.timeout = DEFAULT_TIMEOUT
+        self.memory_limit_mb = DEFAULT_MEMORY_LIMIT_MB
+        self.session = False
+        self.optimize = False
+        self.vectorize = False
+        self.compile_cache = CompileCache()
+        self.profile_path = None
+        self.process = None
+        self.process_session = False
+        self.session_token = None
+        self.running = False
+        self.had_output = False
+        self.stop_reason = None
+        self.marker_tail = ""
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+
+    def is_running(self):
+        return self.running
+
+    def set_session(self, enabled):
+        self.session = enabled
+        self.reset()
+
+    def set_optimize(self, enabled):
+        self.optimize = enabled
+
+    def set_vectorize(self, enabled):
+        self.vectorize = enabled
+
+    def reset(self):
+        if self.process is None or self.running:
+            return
+        process, self.process = self.process, None
+        for signal in (process.readyReadStandardOutput, process.readyReadStandardError,
+                       process.finished, process.errorOccurred):
+            signal.disconnect()
+        process.finished.connect(process.deleteLater)
+        process.kill()
+
+    def start(self, segments, trees=None, profile=False):
+        if self.running:
+            return False
+        if profile and self.session:
+            self.finished.emit("Turn off the persistent session to profile a run.", True)
+            return False
+
+        try:
+            compiled = compile_segments(self.compile_cache, segments, trees, self.optimize, self.vectorize)
+        except SyntaxError as e:
+            import traceback
+            self.finished.emit(f"Error: {''.join(traceback.format_exception_only(type(e), e))}", True)
+            return False
+
+        self.running = True
+        self.had_output = False
+        self.stop_reason = None
+        if profile:
+            import tempfile
+            fd, self.profile_path = tempfile.mkstemp(prefix="visuallang-", suffix=".profile")
+            os.close(fd)
+        if self.process is None:
+            self.start_process()
+        self.process.write(encode_request(compiled))
+        if not self.process_session:
+            self.process.closeWriteChannel()
+        self.timer.start(int(self.timeout * 1000))
+        return True
+
+    def start_process(self):
+        command = worker_command(self.timeout, self.memory_limit_mb, self.session, self.profile_path)
+        self.session_token = None
+        if self.session:
+            import secrets
+            self.session_token = secrets.token_hex(16)
+        environment = QProcessEnvironment()
+        for key, value in worker_environment(session_token=self.session_token).items():
+            environment.insert(key, value)
+
+        self.process_session = self.session
+        self.marker_tail = ""
+        self.decoders = {
+            QProcess.StandardOutput: codecs.getincrementaldecoder("utf-8")("replace"),
+            QProcess.StandardError: codecs.getincrementaldecoder("utf-8")("replace")
+        }
+        self.process = QProcess(self)
+        self.process.setProcessEnvironment(environment)
+        self.process.readyReadStandardOutput.connect(self.read_stdout)
+        self.process.readyReadStandardError.connect(self.read_stderr)
+        self.process.finished.connect(self.on_finished)
+        self.process.errorOccurred.connect(self.on_error)
+        self.process.start(command[0], command[1:])
+
+    def stop(self):
+        self.halt("Execution stopped.")
+
+    def on_timeout(self):
+        self.halt(f"Execution timed out after {self.timeout} s.")
+
+    def halt(self, reason):
+        process = self.process
+        if process is None:
+            return
+        self.stop_reason = reason
+        if self.profile_path is None:
+            process.kill()
+            return
+        process.terminate()
+        QTimer.singleShot(self.KILL_GRACE_MS, lambda: self.process is process and process.kill())
+
+    def read_stdout(self):
+        if self.process is None:
+            return
+        text = self.decoders[QProcess.StandardOutput].decode(bytes(self.process.readAllStandardOutput()))
+        if not self.process_session:
+            self.emit_output(text, False)
+            return
+
+        text = self.marker_tail + text
+        self.marker_tail = ""
+        while text:
+            marker = text.find(DONE_MARKER)
+            if marker < 0:
+                self.emit_output(text, False)
+                return
+            end = text.find("\n", marker)
+            if end < 0:
+                self.emit_output(text[:marker], False)
+                self.marker_tail = text[marker:]
+                return
+            marker = text.rfind(DONE_MARKER, 0, end)
+            done = parse_done_marker(text[marker:end], self.session_token)
+            if done is None:
+                self.emit_output(text[:end + 1], False)
+            else:
+                self.emit_output(text[:marker], False)
+            text = text[end + 1:]
+            if done is not None:
+                self.session_run_done(*done)
+
+    def read_stderr(self):
+        if self.process is not None:
+            text = self.decoders[QProcess.StandardError].decode(bytes(self.process.readAllStandardError()))
+            self.emit_output(text, True)
+
+    def emit_output(self, text, error):
+        if text:
+            self.had_output = True
+            self.output_received.emit(text, error)
+
+    def session_run_done(self, status, skipped):
+        self.read_stderr()
+        message = f"Session: reused {skipped} unchanged top-level blocks." if skipped else ""
+        if status != 0:
+            self.finish(message, True)
+        elif not self.had_output:
+            self.finish(message or "Code executed successfully with no output.", False)
+        else:
+            self.finish(message, False)
+
+    def on_error(self, error):
+        if error == QProcess.FailedToStart:
+            self.finish(f"Could not start the Python interpreter: {self.process.errorString()}", True)
+            self.process.deleteLater()
+            self.process = None
+
+    def on_finished(self, exit_code, exit_status):
+        self.read_stdout()
+        self.emit_output(self.marker_tail, False)
+        self.marker_tail = ""
+        self.read_stderr()
+        process, self.process = self.process, None
+        if process is not None:
+            process.deleteLater()
+        if not self.running:
+            return
+
+        if self.stop_reason:
+            self.finish(self.stop_reason, True)
+        elif exit_status == QProcess.CrashExit:
+            self.finish("Execution was terminated (CPU or memory limit exceeded).", True)
+        elif exit_code != 0:
+            self.finish("", True)
+        elif not self.had_output:
+            self.finish("Code executed successfully with no output.", False)
+        else:
+            self.finish("", False)
+
+    def finish(self, message, error):
+        self.timer.stop()
+        self.running = False
+        if self.process_session != self.session:
+            self.reset()
+        self.finished.emit(message, error)
+        if self.profile_path is not None:
+            path, self.profile_path = self.profile_path, None
+            from profiler import read_profile
+            profile = read_profile(path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.profile_ready.emit(profile)
 
 class VisualLang(QMainWindow):
+    UNDO_LIMIT = 500
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("VisualLang IDE")
         self.setGeometry(100, 100, 1200, 800)
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background-color: {COLORS['bg_primary']};
-            }}
-            QWidget {{
-                background-color: {COLORS['bg_primary']};
-                color: {COLORS['text_primary']};
-                font-family: 'Segoe UI', sans-serif;
-            }}
-            QPushButton {{
-                background-color: {COLORS['accent']};
-                color: {COLORS['bg_primary']};
-                border: none;
-                border-radius: 5px;
-                padding: 8px 15px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: {COLORS['text_primary']};
-            }}
-            QLabel {{
-                color: {COLORS['text_secondary']};
-                font-size: 11pt;
-                font-weight: bold;
-                margin-bottom: 5px;
-            }}
-            QListWidget {{
-                background-color: {COLORS['bg_secondary']};
-                border: none;
-                border-radius: 8px;
-                padding: 5px;
-            }}
-            QListWidget::item {{
-                padding: 8px;
-                margin: 2px;
-                border-radius: 4px;
-            }}
-            QListWidget::item:selected {{
-                background-color: {COLORS['accent']};
-                color: {COLORS['bg_primary']};
-            }}
-            QGraphicsView {{
-                background-color: {COLORS['bg_secondary']};
-                border: none;
-                border-radius: 8px;
-                margin: 5px;
-            }}
-        """)
+        self.setStyleSheet(STYLE_SHEET)
+        self.model = BlockModel()
+        self.code_generator = CodeGenerator(self.model)
+        self.runner = CodeRunner(self)
+        self.runner.output_received.connect(lambda text, error: self.terminal.stream_output(text, error=error))
+        self.runner.finished.connect(self.on_run_finished)
+        self.runner.profile_ready.connect(self.on_profile_ready)
+        self.profile_spans = {}
+        self.profile_rows = []
+        self.run_line_blocks = None
+        self.project_path = None
+        self.undo_stack = QUndoStack(self)
+        self.undo_stack.setUndoLimit(self.UNDO_LIMIT)
         self.initUI()
 
     def initUI(self):
+        file_menu = self.menuBar().addMenu("File")
+        file_actions = [
+            ("Open Project...", QKeySequence.Open, self.open_project),
+            ("Save Project", QKeySequence.Save, self.save_project),
+            ("Save Project As...", QKeySequence.SaveAs, self.save_project_as),
+            ("Export JSON...", None, self.export_json)
+        ]
+        for text, shortcut, handler in file_actions:
+            action = file_menu.addAction(text)
+            if shortcut is not None:
+                action.setShortcut(shortcut)
+            action.triggered.connect(handler)
+
+        edit_menu = self.menuBar().addMenu("Edit")
+        undo_action = self.undo_stack.createUndoAction(self, "Undo")
+        undo_action.setShortcut(QKeySequence.Undo)
+        edit_menu.addAction(undo_action)
+        redo_action = self.undo_stack.createRedoAction(self, "Redo")
+        redo_action.setShortcut(QKeySequence.Redo)
+        edit_menu.addAction(redo_action)
+        edit_menu.addSeparator()
+        block_actions = [
+            ("Copy", QKeySequence.Copy, self.copy_blocks),
+            ("Paste", QKeySequence.Paste, self.paste_blocks),
+            ("Duplicate", QKeySequence("Ctrl+D"), lambda: self.scene.duplicate_blocks(self.scene.selected_ids())),
+            ("Delete", QKeySequence.Delete, lambda: self.scene.delete_blocks(self.scene.selected_ids()))
+        ]
+        self.block_actions = []
+        for text, shortcut, handler in block_actions:
+            action = edit_menu.addAction(text)
+            action.setShortcut(shortcut)
+            action.setShortcutContext(Qt.WidgetWithChildrenShortcut)
+            action.triggered.connect(handler)
+            self.block_actions.append(action)
+
+        view_menu = self.menuBar().addMenu("View")
+        view_actions = [
+            ("Zoom In", QKeySequence.ZoomIn, lambda: self.graphics_view.zoom_by(CanvasView.ZOOM_STEP)),
+            ("Zoom Out", QKeySequence.ZoomOut, lambda: self.graphics_view.zoom_by(1 / CanvasView.ZOOM_STEP)),
+            ("Reset Zoom", QKeySequence("Ctrl+0"), lambda: self.graphics_view.reset_zoom()),
+            ("Zoom to Fit", None, lambda: self.graphics_view.zoom_to_fit())
+        ]
+        for text, shortcut, handler in view_actions:
+            action = view_menu.addAction(text)
+            if shortcut is not None:
+                action.setShortcut(shortcut)
+            action.triggered.connect(handler)
+        view_menu.addSeparator()
+        snap_action = view_menu.addAction("Snap to Grid")
+        snap_action.setCheckable(True)
+        snap_action.setChecked(True)
+        snap_action.toggled.connect(lambda enabled: setattr(self.scene, "snap_to_grid", enabled))
+
+        profile_menu = self.menuBar().addMenu("Profile")
+        profile_actions = [
+            ("Profile Run", "F6", self.gen_profile_code),
+            ("Export Profile Report...", None, self.export_profile_report),
+            ("Clear Heatmap", None, self.clear_heatmap)
+        ]
+        for text, shortcut, handler in profile_actions:
+            action = profile_menu.addAction(text)
+            if shortcut is not None:
+                action.setShortcut(QKeySequence(shortcut))
+            action.triggered.connect(handler)
+
         main_widget = QWidget()
         self.setCentralWidget(main_widget)
         main_layout = QHBoxLayout()
@@ -285,51 +1024,18 @@ class VisualLang(QMainWindow):
         main_widget.setLayout(main_layout)
 
         sidebar_layout = QVBoxLayout()
-        block_tabs = QTabWidget()
-        block_categories = {
-            "Basic": [
-                "Print", "Variable", "Loop",
-                "Condition", "While Loop"
-            ],
-            "Arithmetic": [
-                "Addition", "Subtraction",
-                "Multiplication", "Division",
-                "Rounding", "Modulo"
-            ],
-            "Computational": [
-                "Exponentiation", "Square Root",
-                "Absolute Value", "Min/Max"
-            ],
-            "Control Flow": [
-                "Function", "Return",
-                "Break", "Continue"
-            ],
-            "Data Structures": [
-                "List Create"
-            ],
-            "Type Conversion": [
-                "String Convert", "Int Convert",
-                "Float Convert", "Type Check"
-            ],
-            "String Manipulation": [
-                "String Concat", "String Split",
-                "String Format"
-            ]
-        }
-        for category, blocks in block_categories.items():
-            block_list = QListWidget()
-            for block_name in blocks:
-                item = QListWidgetItem(block_name)
-                block_list.addItem(item)
-            block_list.itemDoubleClicked.connect(self.create_block)
-            block_tabs.addTab(block_list, category)
-    
-        sidebar_layout.addWidget(block_tabs)
-        
         sidebar_label = QLabel("Blocks")
         sidebar_label.setAlignment(Qt.AlignCenter)
         sidebar_layout.addWidget(sidebar_label)
-        sidebar_layout.addWidget(block_list)
+
+        self.palette_categories = list(categories().items())
+        self.block_tabs = QTabWidget()
+        for category, _ in self.palette_categories:
+            self.block_tabs.addTab(QWidget(), category)
+        self.block_tabs.currentChanged.connect(self.populate_palette_tab)
+        self.populate_palette_tab(self.block_tabs.currentIndex())
+        sidebar_layout.addWidget(self.block_tabs)
+
         sidebar_widget = QWidget()
         sidebar_widget.setLayout(sidebar_layout)
         sidebar_widget.setFixedWidth(200)
@@ -338,10 +1044,11 @@ class VisualLang(QMainWindow):
         right_layout = QVBoxLayout()
         right_layout.setSpacing(10)
 
-        self.graphics_view = QGraphicsView()
-        self.scene = QGraphicsScene(0, 0, 2000, 1500)
+        self.graphics_view = CanvasView()
+        self.scene = BlockScene(self.model, 0, 0, 2000, 1500, lazy=True, undo_stack=self.undo_stack)
         self.scene.setBackgroundBrush(QColor(COLORS['bg_secondary']))
         self.graphics_view.setScene(self.scene)
+        self.graphics_view.addActions(self.block_actions)
         right_layout.addWidget(self.graphics_view)
 
         bottom_panel = QHBoxLayout()
@@ -354,6 +1061,9 @@ class VisualLang(QMainWindow):
         buttons = [
             ("Generate Python Code", self.generate_code),
             ("Run Code", self.gen_run_code),
+            ("Profile", self.gen_profile_code),
+            ("Stop", self.stop_code),
+            ("Run Settings", self.edit_run_settings),
             ("Clear Terminal", self.clear_terminal)
         ]
         
@@ -361,22 +1071,23 @@ class VisualLang(QMainWindow):
             btn = QPushButton(text)
             btn.clicked.connect(handler)
             button_layout.addWidget(btn)
+
+        session_toggle = QCheckBox("Persistent session")
+        session_toggle.toggled.connect(self.runner.set_session)
+        button_layout.addWidget(session_toggle)
+
+        optimize_toggle = QCheckBox("Optimize")
+        optimize_toggle.toggled.connect(self.runner.set_optimize)
+        button_layout.addWidget(optimize_toggle)
+
+        vectorize_toggle = QCheckBox("NumPy loops")
+        vectorize_toggle.toggled.connect(self.runner.set_vectorize)
+        button_layout.addWidget(vectorize_toggle)
         
         code_layout.addLayout(button_layout)
 
         self.output_text = QTextEdit()
         self.output_text.setReadOnly(True)
-        self.output_text.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: {COLORS['bg_tertiary']};
-                color: {COLORS['text_primary']};
-                border: none;
-                border-radius: 8px;
-                padding: 10px;
-                font-family: 'Consolas', 'Monaco', monospace;
-                font-size: 11pt;
-            }}
-        """)
         
         code_label = QLabel("Generated Code")
         code_label.setAlignment(Qt.AlignLeft)
@@ -388,6 +1099,7 @@ class VisualLang(QMainWindow):
         terminal_label.setAlignment(Qt.AlignLeft)
         terminal_layout.addWidget(terminal_label)
         self.terminal = Terminal()
+        self.terminal.line_activated.connect(self.show_line)
         terminal_layout.addWidget(self.terminal)
 
         bottom_panel.addLayout(code_layout)
@@ -396,6 +1108,24 @@ class VisualLang(QMainWindow):
         right_layout.addLayout(bottom_panel)
         main_layout.addLayout(right_layout)
 
+    def populate_palette_tab(self, index):
+        page = self.block_tabs.widget(index)
+        if page is None or page.layout() is not None:
+            return
+        block_list = QListWidget()
+        for spec in self.palette_categories[index][1]:
+            item = QListWidgetItem(spec.label)
+            item.setData(Qt.UserRole, spec.name)
+            block_list.addItem(item)
+        block_list.itemDoubleClicked.connect(self.create_block)
+        layout = QVBoxLayout(page)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(block_list)
+
+    def closeEvent(self, event):
+        self.runner.stop()
+        super().closeEvent(event)
+
     def clear_terminal(self):
         self.terminal.clear_terminal()
 
@@ -403,167 +1133,234 @@ class VisualLang(QMainWindow):
         self.generate_code()
         self.run_code()
 
-    def run_code(self):
+    def gen_profile_code(self):
+        self.generate_code()
+        self.run_code(profile=True)
+
+    def run_code(self, profile=False):
         code = self.output_text.toPlainText()
         if not code.strip():
             self.terminal.append_output("No code to run!", error=True)
             return
+        if self.runner.is_running():
+            self.terminal.append_output("A program is already running. Stop it first.", error=True)
+            return
+
+        generator = self.code_generator
+        runner = self.runner
+        generated = code == "\n".join(generator.lines) and generator.is_current()
+        self.run_line_blocks = generator.line_blocks if generated else None
+        if profile and not generated:
+            self.terminal.append_output("Generate the code before profiling it.", error=True)
+            return
+        segments, trees = [(1, code)], None
+        if generated:
+            try:
+                segments, trees = generator.run_segments(runner.optimize, runner.vectorize, runner.session)
+            except SyntaxError as e:
+                import traceback
+                self.terminal.append_output(f"Error: {''.join(traceback.format_exception_only(type(e), e))}",
+                                            error=True)
+                return
+        if profile:
+            self.profile_spans = generator.block_spans()
+        runner.start(segments, trees, profile)
+
+    def stop_code(self):
+        self.runner.stop()
+
+    def on_run_finished(self, message, error):
+        if message:
+            self.terminal.append_output(message, error=error)
+
+    def show_line(self, line):
+        line_blocks = self.run_line_blocks
+        if line_blocks is None or not 1 <= line <= len(line_blocks):
+            self.terminal.append_output(f"Line {line} does not belong to a block.", error=True)
+            return
+        block_id = line_blocks[line - 1]
+        if block_id not in self.model:
+            self.terminal.append_output(f"The block for line {line} has been deleted.", error=True)
+            return
+        self.graphics_view.centerOn(self.scene.reveal_block(block_id))
+
+    def on_profile_ready(self, profile):
+        if profile is None:
+            self.terminal.append_output("No profile was recorded for this run.", error=True)
+            return
+        from profiler import block_costs, cost_summary, profile_rows
+        costs = block_costs(self.profile_spans, profile["lines"])
+        self.profile_rows = profile_rows(self.model, self.profile_spans, costs)
+        total = sum(row[5] for row in self.profile_rows)
+        slowest = max((row[5] for row in self.profile_rows), default=0.0)
+        heatmap = {}
+        for row in self.profile_rows:
+            heat = row[5] / slowest if row[4] and slowest > 0 else None
+            heatmap[row[0]] = (heat, cost_summary(row, total))
+        self.scene.set_heatmap(heatmap)
 
-        stdout = io.StringIO()
+        hottest = ", ".join(f"{row[2]} ({row[5] * 1000:.1f} ms)" for row in self.profile_rows[:3] if row[4])
+        self.terminal.append_output(f"Profile: {total * 1000:.1f} ms in blocks. Slowest: {hottest or 'none'}. "
+                                    f"Hover a block for details.")
+
+    def export_profile_report(self):
+        if not self.profile_rows:
+            self.terminal.append_output("Profile a run before exporting a report.", error=True)
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Profile Report", "", "CSV (*.csv)")
+        if not path:
+            return
+        from profiler import write_report
         try:
-            with redirect_stdout(stdout):
-                exec(code)
-            output = stdout.getvalue()
-            if output:
-                self.terminal.append_output(output)
-            else:
-                self.terminal.append_output("Code executed successfully with no output.")
-        except Exception as e:
-            error_msg = f"Error: {str(e)}\n{traceback.format_exc()}"
-            self.terminal.append_output(error_msg, error=True)
-        finally:
-            stdout.close()
+            write_report(path, self.profile_rows)
+        except OSError as e:
+            self.terminal.append_output(f"Could not save {path}: {e}", error=True)
+
+    def clear_heatmap(self):
+        self.profile_rows = []
+        self.scene.set_heatmap({})
+
+    def edit_run_settings(self):
+        timeout, ok = QInputDialog.getInt(self, "Run Settings", "Time limit (seconds):",
+                                          self.runner.timeout, 1, 3600)
+        if not ok:
+            return
+        memory, ok = QInputDialog.getInt(self, "Run Settings", "Memory limit (MB, 0 for none):",
+                                         self.runner.memory_limit_mb, 0, 65536)
+        if not ok:
+            return
+        self.runner.timeout = timeout
+        self.runner.memory_limit_mb = memory
+        self.runner.reset()
+
+    def open_project(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Project", "", PROJECT_FILTER)
+        if not path:
+            return
+        try:
+            loaded = load_program(path)
+        except (OSError, ProjectError) as e:
+            self.terminal.append_output(f"Could not open {path}: {e}", error=True)
+            return
+
+        self.model.reset(loaded)
+        self.undo_stack.clear()
+        self.scene.fit_to_model()
+        self.graphics_view.update_visible_rect()
+        self.set_project_path(path)
+
+    def save_project(self):
+        if self.project_path is None or self.project_path.lower().endswith(".json"):
+            self.save_project_as()
+            return
+        self.write_project(self.project_path, save_program)
+
+    def save_project_as(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Project", "", PROJECT_FILTER)
+        if path and self.write_project(path, save_program):
+            self.set_project_path(path)
+
+    def export_json(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export JSON", "", "JSON (*.json)")
+        if path:
+            self.write_project(path, save_json)
+
+    def write_project(self, path, writer):
+        try:
+            writer(self.model, path)
+        except OSError as e:
+            self.terminal.append_output(f"Could not save {path}: {e}", error=True)
+            return False
+        return True
+
+    def set_project_path(self, path):
+        self.project_path = path
+        self.setWindowTitle(f"VisualLang IDE - {os.path.basename(path)}")
 
     def create_block(self, item):
-        block_type = item.text()
-        block = Block(block_type)
-        block.setFlag(QGraphicsItem.ItemIsFocusable)
-        block.setAcceptedMouseButtons(Qt.LeftButton)
-        self.scene.addItem(block)
-        block.setPos(50, 50)
-        block.mouseDoubleClickEvent = lambda event: block.edit_block()
-
-    def block_rel(self):
-        blocks = [item for item in self.scene.items() if isinstance(item, Block)]
-
-        for block in blocks:
-            block.nested_blocks = []
-            block.parent_block = None
-
-        vertical_groups = {}
-        for block in blocks:
-            y_pos = block.pos().y()
-            found_group = False
-            for group_y in vertical_groups.keys():
-                if abs(y_pos - group_y) <= Block.VERTICAL_TOLERANCE:
-                    vertical_groups[group_y].append(block)
-                    found_group = True
-                    break
-            if not found_group:
-                vertical_groups[y_pos] = [block]
-
-        sorted_groups = sorted(vertical_groups.items(), key=lambda x: x[0])
-
-        for i, (y_pos, group) in enumerate(sorted_groups):
-            group.sort(key=lambda b: b.pos().x())
-
-            if i > 0:
-                prev_group = sorted_groups[i-1][1]
-                if prev_group:
-                    leftmost = min(group, key=lambda b: b.pos().x())
-                    if abs(leftmost.pos().x() - prev_group[0].pos().x()) < Block.INDENT_THRESHOLD:
-                        continue
-
-            for j, block in enumerate(group):
-                if j > 0:
-                    prev_block = group[j-1]
-                    if (block.pos().x() > prev_block.pos().x() + Block.INDENT_THRESHOLD and
-                        prev_block.block_type in ["Loop", "Condition"]):
-                        block.parent_block = prev_block
-                        prev_block.nested_blocks.append(block)
-        return blocks
+        block_type = item.data(Qt.UserRole)
+        position = self.graphics_view.drop_position()
+        record = (self.model.next_id, block_type, default_args(block_type), position.x(), position.y())
+        push_command(self.undo_stack, AddBlocksCommand(self.model, [record]))
 
-    def generate_code(self):
-        blocks = self.block_rel()
+    def copy_blocks(self):
+        node_ids = self.scene.with_subtrees(self.scene.selected_ids())
+        if not node_ids:
+            return
+        mime_data = QMimeData()
+        mime_data.setData(CLIPBOARD_FORMAT, dumps_blocks(self.model, node_ids).encode("utf-8"))
+        QApplication.clipboard().setMimeData(mime_data)
 
-        root_blocks = [block for block in blocks if block.parent_block is None]
-        root_blocks.sort(key=lambda b: b.pos().y())
-        
-        code = []
-        for block in root_blocks:
-            code.append(self.generate_block_code(block, 0))
-            
-        self.output_text.setText("\n".join(filter(None, code)))
-
-    def generate_block_code(self, block, indent_level):
-        indent = "    " * indent_level
-        code = []
-
-        def safe_split(text):
-            parts = text.split(': ')
-            return parts[-1].split(',') if len(parts) > 1 else []
-
-        parts = safe_split(block.text)
-        var_name = parts[0].strip() if len(parts) > 0 else ""
-        first_val = parts[1].strip() if len(parts) > 1 else ""
-        second_val = parts[2].strip() if len(parts) > 2 else ""
-
-        block_type_mapping = {
-            "Print": f"{indent}print({block.text.split(': ')[-1]})",
-            "Variable": f"{indent}{block.text.split(': ')[-1]}",
-            "Loop": f"{indent}for i in {block.text.split(': ')[-1]}:",
-            "Condition": f"{indent}if {block.text.split(': ')[-1]}:",
-            "WhileLoop": f"{indent}while {block.text.split(': ')[-1]}:",
-            "Exponentiation": f"{indent}{var_name} = {first_val} ** {second_val}",
-            "SquareRoot": f"{indent}{var_name} = {first_val} ** 0.5",
-            "AbsoluteValue": f"{indent}{var_name} = abs({first_val})",
-            "MinMax": f"{indent}{var_name} = max({first_val}, {second_val})",
-            "Function": f"{indent}{block.text.split(': ')[-1]}:",
-            "Return": f"{indent}return {block.text.split(': ')[-1]}",
-            "Break": f"{indent}break",
-            "Continue": f"{indent}continue",
-            "ListCreate": f"{indent}{var_name} = {first_val}",
-            "DictCreate": f"{indent}{var_name} = {first_val}",
-            "ListAppend": f"{indent}{first_val}.append({second_val})",
-            "Comprehension": f"{indent}{var_name} = {first_val}",
-            "StringConvert": f"{indent}{var_name} = str({first_val})",
-            "IntConvert": f"{indent}{var_name} = int({first_val})",
-            "FloatConvert": f"{indent}{var_name} = float({first_val})",
-            "TypeCheck": f"{indent}{var_name} = type({first_val})",
-            "StringConcat": f"{indent}{var_name} = {first_val} + {second_val}",
-            "StringSplit": f"{indent}{var_name} = {first_val}.split({second_val})",
-            "StringFormat": f"{indent}{var_name} = {first_val}.format({second_val})",
-            "StringLength": f"{indent}{var_name} = len({first_val})"
-        }
+    def paste_blocks(self):
+        mime_data = QApplication.clipboard().mimeData()
+        if mime_data is None or not mime_data.hasFormat(CLIPBOARD_FORMAT):
+            return
+        try:
+            clip = loads_blocks(bytes(mime_data.data(CLIPBOARD_FORMAT)).decode("utf-8"))
+        except (ProjectError, UnicodeDecodeError) as e:
+            self.terminal.append_output(f"Could not paste blocks: {e}", error=True)
+            return
+        position = self.graphics_view.drop_position(under_cursor=True)
+        self.scene.add_copies(clip.records(list(clip.nodes)), position.x(), position.y(), "Paste")
 
-        two_input_ops = {
-            "Addition": " + ",
-            "Subtraction": " - ",
-            "Multiplication": " * ",
-            "Division": " / ",
-            "Modulo": " % "
-        }
+    def generate_code(self):
+        generator = self.code_generator
+        shown_lines = len(generator.lines)
+        hunks = generator.generate()
+        document = self.output_text.document()
+        if not shown_lines or document.blockCount() != shown_lines:
+            self.output_text.setPlainText("\n".join(generator.lines))
+            return
 
-        if block.block_type in two_input_ops:
-            op_line = f"{indent}{var_name} = {first_val}{two_input_ops[block.block_type]}{second_val}"
-            block_type_mapping[block.block_type] = op_line
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        for start, end, new_lines in reversed(hunks):
+            self.patch_lines(cursor, shown_lines, start, end, new_lines)
+        cursor.endEditBlock()
 
-        if block.block_type == "Rounding":
-            block_type_mapping["Rounding"] = f"{indent}{var_name} = round({first_val}, {second_val})"
+    def patch_lines(self, cursor, line_count, start, end, new_lines):
+        document = cursor.document()
 
-        code.append(block_type_mapping.get(block.block_type, ""))
+        def line_start(number):
+            return document.findBlockByNumber(number).position()
 
-        if block.block_type in ["Loop", "Condition", "WhileLoop"]:
-            nested_blocks = sorted(block.nested_blocks, key=lambda b: b.pos().y())
-            if nested_blocks:
-                for nested in nested_blocks:
-                    code.append(self.generate_block_code(nested, indent_level + 1))
+        def line_end(number):
+            block = document.findBlockByNumber(number)
+            return block.position() + block.length() - 1
+
+        text = "\n".join(new_lines)
+        if start < end:
+            if new_lines:
+                first, last = line_start(start), line_end(end - 1)
+            elif end < line_count:
+                first, last = line_start(start), line_start(end)
+            elif start > 0:
+                first, last = line_end(start - 1), line_end(end - 1)
             else:
-                code.append(f"{indent}    pass")
+                first, last = line_start(start), line_end(end - 1)
+        elif start < line_count:
+            first = last = line_start(start)
+            text += "\n"
+        else:
+            first = last = line_end(line_count - 1)
+            text = "\n" + text
 
-        next_vertical = next((b for b in self.scene.items()
-                            if isinstance(b, Block) and 
-                            abs(b.pos().y() - (block.pos().y() + Block.VERTICAL_SPACING)) < Block.VERTICAL_TOLERANCE and
-                            abs(b.pos().x() - block.pos().x()) < Block.INDENT_THRESHOLD and 
-                            b.parent_block is None), None)
-        
-        if next_vertical:
-            code.append(self.generate_block_code(next_vertical, indent_level))
+        cursor.setPosition(first)
+        cursor.setPosition(last, QTextCursor.KeepAnchor)
+        cursor.insertText(text)
 
-        return "\n".join(filter(None, code))
+def report_startup(window, times):
+    window.repaint()
+    times.append(("interactive", time.time()))
+    print("startup " + " ".join(f"{name}={value:.6f}" for name, value in times), flush=True)
+    QApplication.quit()
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    times = [("imported", time.time())]
+    app = QApplication([arg for arg in sys.argv if arg != STARTUP_PROBE])
     window = VisualLang()
     window.show()
+    times.append(("shown", time.time()))
+    if STARTUP_PROBE in sys.argv:
+        QTimer.singleShot(0, lambda: report_startup(window, times))
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,134 @@
+import sys
+from contextlib import contextmanager
+
+from registry import default_args, display_text
+from spatial_index import SpatialIndex
+
+VERTICAL_SPACING = 60
+VERTICAL_TOLERANCE = 20
+INDENT_THRESHOLD = 20
+
+class BlockNode:
+    __slots__ = ("id", "block_type", "args", "x", "y", "parent", "children")
+
+    def __init__(self, node_id, block_type, args, x, y):
+        self.id = node_id
+        self.block_type = block_type
+        self.args = args
+        self.x = x
+        self.y = y
+        self.parent = None
+        self.children = ()
+
+    @property
+    def text(self):
+        return display_text(self.block_type, self.args)
+
+    def __repr__(self):
+        return f"BlockNode({self.id}, {self.block_type!r}, {self.args!r}, {self.x}, {self.y})"
+
+
+class BlockModel:
+    def __init__(self):
+        self.nodes = {}
+        self.index = SpatialIndex(INDENT_THRESHOLD, VERTICAL_TOLERANCE)
+        self.listeners = []
+        self.next_id = 1
+        self.batch_depth = 0
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes.values())
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def __getitem__(self, node_id):
+        return self.nodes[node_id]
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def add_block(self, block_type, args=None, x=0.0, y=0.0, node_id=None):
+        if node_id is None:
+            node_id = self.next_id
+        elif node_id in self.nodes:
+            raise KeyError(f"Block {node_id} already exists")
+        self.next_id = max(self.next_id, node_id + 1)
+
+        block_type = sys.intern(block_type)
+        node = BlockNode(node_id, block_type, default_args(block_type) if args is None else tuple(args),
+                         float(x), float(y))
+        self.nodes[node_id] = node
+        self.index.insert(node_id, node.x, node.y)
+        for listener in self.listeners:
+            listener.block_added(node)
+        return node
+
+    def move_block(self, node_id, x, y):
+        node = self.nodes[node_id]
+        if node.x == x and node.y == y:
+            return
+        node.x = float(x)
+        node.y = float(y)
+        self.index.move(node_id, node.x, node.y)
+        for listener in self.listeners:
+            listener.block_moved(node)
+
+    def set_args(self, node_id, args):
+        node = self.nodes[node_id]
+        args = tuple(args)
+        if node.args == args:
+            return
+        node.args = args
+        for listener in self.listeners:
+            listener.block_changed(node)
+
+    def remove_block(self, node_id):
+        node = self.nodes.pop(node_id)
+        self.index.remove(node_id)
+        for listener in self.listeners:
+            listener.block_removed(node)
+        return node
+
+    @contextmanager
+    def batch(self):
+        self.batch_depth += 1
+        if self.batch_depth == 1:
+            for listener in self.listeners:
+                listener.batch_started()
+        try:
+            yield
+        finally:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                for listener in self.listeners:
+                    listener.batch_finished()
+
+    def records(self, node_ids):
+        nodes = self.nodes
+        return [(node_id, nodes[node_id].block_type, nodes[node_id].args, nodes[node_id].x, nodes[node_id].y)
+                for node_id in node_ids]
+
+    def add_records(self, records):
+        for node_id, block_type, args, x, y in records:
+            self.add_block(block_type, args, x, y, node_id)
+
+    def remove_blocks(self, node_ids):
+        for node_id in node_ids:
+            self.remove_block(node_id)
+
+    def clear(self):
+        self.reset(BlockModel())
+
+    def reset(self, other):
+        self.nodes = other.nodes
+        self.index = other.index
+        self.next_id = other.next_id
+        for listener in self.listeners:
+            listener.model_reset()
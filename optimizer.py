@@ -0,0 +1,264 @@
+import ast
+import math
+import operator
+from collections import Counter
+
+MAX_INT_BITS = 128
+MAX_STR_LENGTH = 256
+SQRT_NAME = "_vl_sqrt"
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+FOLDABLE_TYPES = (int, float, complex, str)
+PURE_NODES = (ast.Constant, ast.Name, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+              ast.operator, ast.unaryop, ast.boolop, ast.cmpop, ast.expr_context)
+
+
+def _literal(node):
+    return isinstance(node, ast.Constant) and type(node.value) in FOLDABLE_TYPES + (bool,)
+
+
+def _small(value):
+    if isinstance(value, int):
+        return value.bit_length() <= MAX_INT_BITS
+    if isinstance(value, str):
+        return len(value) <= MAX_STR_LENGTH
+    return True
+
+
+def _too_large(op, left, right):
+    if isinstance(op, ast.Pow) and isinstance(left, int) and isinstance(right, int) and right > 0:
+        return max(left.bit_length(), 1) * right > MAX_INT_BITS * 2
+    if isinstance(op, ast.Mult):
+        for sequence, count in ((left, right), (right, left)):
+            if isinstance(sequence, str) and isinstance(count, int):
+                return len(sequence) * count > MAX_STR_LENGTH
+    return False
+
+
+def _pure(node):
+    if isinstance(node, ast.Call):
+        return (isinstance(node.func, ast.Name) and node.func.id == SQRT_NAME
+                and len(node.args) == 1 and not node.keywords)
+    return isinstance(node, PURE_NODES)
+
+
+def _sqrt_call(node, operand):
+    function = ast.copy_location(ast.Name(SQRT_NAME, ast.Load()), node)
+    return ast.copy_location(ast.Call(function, [operand], []), node)
+
+
+class ConstantFolder(ast.NodeTransformer):
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        left, right = node.left, node.right
+        function = BINARY_OPERATORS.get(type(node.op))
+        if function is not None and _literal(left) and _literal(right):
+            if not _too_large(node.op, left.value, right.value):
+                try:
+                    value = function(left.value, right.value)
+                except (ArithmeticError, TypeError, ValueError):
+                    value = None
+                if value is not None and type(value) in FOLDABLE_TYPES + (bool,) and _small(value):
+                    return ast.copy_location(ast.Constant(value), node)
+
+        if (isinstance(node.op, ast.Pow) and isinstance(right, ast.Constant)
+                and type(right.value) is float and right.value == 0.5):
+            return _sqrt_call(node, left)
+        return node
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if (isinstance(node.func, ast.Name) and node.func.id == SQRT_NAME and len(node.args) == 1
+                and _literal(node.args[0]) and not isinstance(node.args[0].value, str)):
+            try:
+                return ast.copy_location(ast.Constant(node.args[0].value ** 0.5), node)
+            except ArithmeticError:
+                pass
+        return node
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        function = UNARY_OPERATORS.get(type(node.op))
+        if function is not None and _literal(node.operand) and not isinstance(node.operand.value, str):
+            return ast.copy_location(ast.Constant(function(node.operand.value)), node)
+        return node
+
+
+def _negative(node):
+    return (isinstance(node, ast.Constant) and type(node.value) in (int, float)
+            and math.copysign(1, node.value) < 0)
+
+
+def _signed(node):
+    operand = ast.copy_location(ast.Constant(-node.value), node)
+    return ast.copy_location(ast.UnaryOp(ast.USub(), operand), node)
+
+
+class NegativeBases(ast.NodeTransformer):
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow) and _negative(node.left):
+            node.left = _signed(node.left)
+        return node
+
+    def visit_Attribute(self, node):
+        self.generic_visit(node)
+        if _negative(node.value):
+            node.value = _signed(node.value)
+        return node
+
+    visit_Subscript = visit_Attribute
+
+
+class NameSubstituter(ast.NodeTransformer):
+    def __init__(self, constants):
+        self.constants = constants
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.constants:
+            return ast.copy_location(ast.Constant(self.constants[node.id]), node)
+        return node
+
+    def visit_FunctionDef(self, node):
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_Lambda = visit_FunctionDef
+    visit_ClassDef = visit_FunctionDef
+
+
+def store_counts(tree):
+    counts = Counter()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if not isinstance(node.ctx, ast.Load):
+                counts[node.id] += 1
+        elif isinstance(node, ast.arg):
+            counts[node.arg] += 1
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            counts[node.name] += 1
+        elif isinstance(node, ast.alias):
+            counts[(node.asname or node.name).partition(".")[0]] += 1
+        elif isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)) and node.name:
+            counts[node.name] += 1
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            counts[node.rest] += 1
+    return counts
+
+
+def declared_globals(tree):
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+    return names
+
+
+def propagate_constants(module):
+    counts = store_counts(module)
+    rebound = declared_globals(module)
+    constants = {}
+    substituter = NameSubstituter(constants)
+    folder = ConstantFolder()
+    for index, statement in enumerate(module.body):
+        statement = folder.visit(substituter.visit(statement))
+        module.body[index] = statement
+        if (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                and isinstance(statement.targets[0], ast.Name) and _literal(statement.value)):
+            name = statement.targets[0].id
+            if counts[name] == 1 and name not in rebound:
+                constants[name] = statement.value.value
+    return module
+
+
+def _loads(node):
+    return {child.id for child in ast.walk(node) if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load)}
+
+
+def _runs_at_least_once(loop, counts):
+    if isinstance(loop, ast.While):
+        return isinstance(loop.test, ast.Constant) and bool(loop.test.value)
+
+    iterable = loop.iter
+    if isinstance(iterable, (ast.List, ast.Tuple, ast.Set)):
+        return bool(iterable.elts) and not any(isinstance(element, ast.Starred) for element in iterable.elts)
+    if isinstance(iterable, ast.Constant):
+        return isinstance(iterable.value, (str, bytes)) and bool(iterable.value)
+    if (isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Name) and iterable.func.id == "range"
+            and counts["range"] == 0 and not iterable.keywords and 1 <= len(iterable.args) <= 3
+            and all(isinstance(arg, ast.Constant) and type(arg.value) is int for arg in iterable.args)):
+        try:
+            return len(range(*(arg.value for arg in iterable.args))) > 0
+        except (ValueError, OverflowError):
+            return False
+    return False
+
+
+def _hoist_loop(loop, rebound):
+    loop_stores = store_counts(loop)
+    seen = _loads(loop.iter if isinstance(loop, ast.For) else loop.test)
+    if isinstance(loop, ast.For):
+        seen |= {node.id for node in ast.walk(loop.target) if isinstance(node, ast.Name)}
+
+    hoisted = []
+    hoisted_names = set()
+    for statement in loop.body:
+        if not (isinstance(statement, ast.Assign) and len(statement.targets) == 1):
+            break
+        target = statement.targets[0]
+        value = statement.value
+        if not (isinstance(target, ast.Name) and loop_stores[target.id] == 1
+                and target.id not in seen and target.id not in rebound
+                and all(_pure(node) for node in ast.walk(value))
+                and not any((loop_stores[name] and name not in hoisted_names) or name in rebound
+                            for name in _loads(value))):
+            break
+        hoisted.append(statement)
+        hoisted_names.add(target.id)
+
+    if hoisted:
+        loop.body = loop.body[len(hoisted):] or [ast.copy_location(ast.Pass(), loop)]
+    return hoisted
+
+
+def _hoist_body(body, counts, rebound):
+    result = []
+    for statement in body:
+        for field in ("body", "orelse", "finalbody"):
+            nested = getattr(statement, field, None)
+            if nested and isinstance(nested[0], ast.stmt):
+                setattr(statement, field, _hoist_body(nested, counts, rebound))
+        if isinstance(statement, (ast.For, ast.While)) and _runs_at_least_once(statement, counts):
+            result.extend(_hoist_loop(statement, rebound))
+        result.append(statement)
+    return result
+
+
+def hoist_invariants(module):
+    module.body = _hoist_body(module.body, store_counts(module), declared_globals(module))
+    return module
+
+
+def optimize(module):
+    module = ConstantFolder().visit(module)
+    module = propagate_constants(module)
+    module = hoist_invariants(module)
+    module = propagate_constants(module)
+    module = NegativeBases().visit(module)
+    uses_sqrt = any(isinstance(node, ast.Name) and node.id == SQRT_NAME for node in ast.walk(module))
+    if uses_sqrt and module.body:
+        sqrt_import = ast.ImportFrom("math", [ast.alias("sqrt", SQRT_NAME)], 0)
+        module.body.insert(0, ast.copy_location(sqrt_import, module.body[0]))
+    return ast.fix_missing_locations(module)
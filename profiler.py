@@ -0,0 +1,126 @@
+import csv
+import json
+import sys
+import time
+
+PROFILE_VERSION = 1
+
+
+class LineProfiler:
+    def __init__(self, filename):
+        self.filename = filename
+        self.hits = {}
+        self.times = {}
+        self.current = {}
+        self.started = None
+        self.elapsed = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        sys.settrace(self.trace_call)
+
+    def stop(self):
+        sys.settrace(None)
+        if self.started is not None:
+            self.elapsed += time.perf_counter() - self.started
+            self.started = None
+        now = time.perf_counter()
+        for line, started in self.current.values():
+            self.times[line] = self.times.get(line, 0.0) + now - started
+        self.current.clear()
+
+    def trace_call(self, frame, event, arg):
+        if frame.f_code.co_filename != self.filename:
+            return None
+        caller = self.current.get(frame.f_back)
+        if caller is not None:
+            now = time.perf_counter()
+            self.times[caller[0]] = self.times.get(caller[0], 0.0) + now - caller[1]
+        return self.trace_line
+
+    def trace_line(self, frame, event, arg):
+        now = time.perf_counter()
+        last = self.current.pop(frame, None)
+        if last is not None:
+            self.times[last[0]] = self.times.get(last[0], 0.0) + now - last[1]
+        if event == "line":
+            line = frame.f_lineno
+            self.hits[line] = self.hits.get(line, 0) + 1
+            self.current[frame] = (line, time.perf_counter())
+        elif event == "exception" and last is not None:
+            self.current[frame] = (last[0], now)
+        elif event == "return":
+            caller = self.current.get(frame.f_back)
+            if caller is not None:
+                self.current[frame.f_back] = (caller[0], time.perf_counter())
+        return self.trace_line
+
+    def write(self, path):
+        lines = [[line, self.hits.get(line, 0), self.times.get(line, 0.0)]
+                 for line in sorted(self.hits.keys() | self.times.keys())]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": PROFILE_VERSION, "total": self.elapsed, "lines": lines}, f)
+
+
+def read_profile(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != PROFILE_VERSION:
+        return None
+    return data
+
+
+def block_costs(spans, lines):
+    if not spans:
+        return {}
+    size = max(end for _, _, end in spans.values())
+    hits = [0] * size
+    elapsed = [0.0] * (size + 1)
+    for line, line_hits, line_time in lines:
+        if 1 <= line <= size:
+            hits[line - 1] += line_hits
+            elapsed[line] += line_time
+    for index in range(size):
+        elapsed[index + 1] += elapsed[index]
+
+    costs = {}
+    for block_id, (start, own_end, end) in spans.items():
+        block_hits = hits[start] if own_end > start else 0
+        costs[block_id] = (block_hits, elapsed[own_end] - elapsed[start], elapsed[end] - elapsed[start])
+    return costs
+
+
+def profile_rows(model, spans, costs):
+    rows = []
+    for block_id, (block_hits, own, cumulative) in costs.items():
+        if block_id not in model:
+            continue
+        node = model[block_id]
+        rows.append((block_id, node.block_type, node.text, spans[block_id][0] + 1, block_hits, own, cumulative))
+    rows.sort(key=lambda row: (-row[5], row[3]))
+    return rows
+
+
+def cost_summary(row, total):
+    _, _, _, line, block_hits, own, cumulative = row
+    if not block_hits:
+        return f"Line {line}: not executed"
+    percent = 100 * own / total if total > 0 else 0.0
+    lines = [f"Line {line}: {block_hits} hits", f"{own * 1000:.2f} ms ({percent:.1f}% of the run)"]
+    if cumulative > own:
+        lines.append(f"{cumulative * 1000:.2f} ms including nested blocks")
+    return "\n".join(lines)
+
+
+def write_report(path, rows):
+    total = sum(row[5] for row in rows)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["block", "type", "text", "line", "hits", "time_ms", "cumulative_ms", "percent"])
+        for block_id, block_type, text, line, block_hits, own, cumulative in rows:
+            percent = 100 * own / total if total > 0 else 0.0
+            writer.writerow([block_id, block_type, text, line, block_hits,
+                             f"{own * 1000:.3f}", f"{cumulative * 1000:.3f}", f"{percent:.1f}"])
@@ -0,0 +1,258 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from model import BlockModel
+from registry import ArgumentError, get_spec, parse_text
+
+FORMAT_NAME = "visuallang"
+FORMAT_VERSION = 2
+BINARY_MAGIC = b"VLPB"
+BINARY_VERSION = 2
+BINARY_HEADER = struct.Struct("<4sHHIIII")
+ALIGNMENT = 8
+
+
+class ProjectError(Exception):
+    pass
+
+
+def model_to_dict(model):
+    return {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "blocks": [{"id": node.id, "type": node.block_type, "args": list(node.args), "x": node.x, "y": node.y}
+                   for node in model]
+    }
+
+
+def checked_args(block_type, args):
+    spec = get_spec(block_type)
+    if spec is None:
+        return args
+    try:
+        spec.validate(args)
+    except ArgumentError as e:
+        raise ProjectError(f"Invalid {block_type} block: {e}") from e
+    return args
+
+
+def legacy_args(block_type, text):
+    spec = get_spec(block_type)
+    args = parse_text(block_type, text)
+    if spec is None:
+        return args
+    return tuple(value or default for value, default in zip(args, spec.defaults))
+
+
+def model_from_dict(data, model=None):
+    if not isinstance(data, dict) or data.get("format") != FORMAT_NAME:
+        raise ProjectError("Not a VisualLang program")
+    if data.get("version", 0) > FORMAT_VERSION:
+        raise ProjectError(f"Unsupported program version {data.get('version')}")
+
+    model = BlockModel() if model is None else model
+    checked = set()
+    try:
+        for block in data["blocks"]:
+            if "args" in block:
+                args = tuple(str(value) for value in block["args"])
+                key = (block["type"], args)
+                if key not in checked:
+                    checked_args(*key)
+                    checked.add(key)
+            else:
+                args = legacy_args(block["type"], block["text"])
+            model.add_block(block["type"], args, block["x"], block["y"], node_id=block.get("id"))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ProjectError(f"Malformed block entry: {e}") from e
+    return model
+
+
+def dumps_blocks(model, node_ids):
+    nodes = [model[node_id] for node_id in node_ids]
+    left = min((node.x for node in nodes), default=0.0)
+    top = min((node.y for node in nodes), default=0.0)
+    clip = BlockModel()
+    for node in nodes:
+        clip.add_block(node.block_type, node.args, node.x - left, node.y - top, node.id)
+    return json.dumps(model_to_dict(clip))
+
+
+def loads_blocks(text):
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ProjectError(f"Invalid JSON: {e}") from e
+    return model_from_dict(data)
+
+
+def save_json(model, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(model_to_dict(model), f, indent=1)
+
+
+def load_json(path, model=None):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ProjectError(f"Invalid JSON: {e}") from e
+    return model_from_dict(data, model)
+
+
+def _padding(size):
+    return -size % ALIGNMENT
+
+
+def _column_bytes(column):
+    if sys.byteorder == "big" and column.itemsize > 1:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def save_binary(model, path):
+    types = {}
+    texts = {}
+    ids = array("I")
+    xs = array("d")
+    ys = array("d")
+    arg_offsets = array("I", [0])
+    arg_index = array("I")
+    type_index = array("H")
+    for node in model:
+        ids.append(node.id)
+        xs.append(node.x)
+        ys.append(node.y)
+        arg_index.extend(texts.setdefault(arg, len(texts)) for arg in node.args)
+        arg_offsets.append(len(arg_index))
+        type_index.append(types.setdefault(node.block_type, len(types)))
+
+    encoded_texts = [text.encode("utf-8") for text in texts]
+    text_offsets = array("I", [0])
+    for encoded in encoded_texts:
+        text_offsets.append(text_offsets[-1] + len(encoded))
+    type_blob = "\n".join(types).encode("utf-8")
+    text_blob = b"".join(encoded_texts)
+
+    columns = (xs, ys, ids, arg_offsets, arg_index, text_offsets, type_index)
+    sections = [_column_bytes(column) for column in columns]
+    sections += [type_blob, text_blob]
+    with open(path, "wb") as f:
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, len(ids), len(type_blob),
+                                   len(texts), len(text_blob)))
+        for section in sections:
+            f.write(section)
+            f.write(b"\0" * _padding(len(section)))
+
+
+def _read_column(view, offset, typecode, count):
+    column = array(typecode)
+    end = offset + column.itemsize * count
+    if end > len(view):
+        raise ProjectError("Truncated program file")
+    column.frombytes(view[offset:end])
+    if sys.byteorder == "big" and column.itemsize > 1:
+        column.byteswap()
+    return column, end + _padding(end - offset)
+
+
+def _read_blob(view, offset, size):
+    end = offset + size
+    if end > len(view):
+        raise ProjectError("Truncated program file")
+    return bytes(view[offset:end]), end + _padding(size)
+
+
+def _load_columns(view):
+    if len(view) < BINARY_HEADER.size:
+        raise ProjectError("Truncated program file")
+    magic, version, _, count, type_blob_size, text_count, text_blob_size = BINARY_HEADER.unpack_from(view)
+    if magic != BINARY_MAGIC:
+        raise ProjectError("Not a VisualLang program")
+    if version > BINARY_VERSION:
+        raise ProjectError(f"Unsupported program version {version}")
+
+    offset = BINARY_HEADER.size
+    xs, offset = _read_column(view, offset, "d", count)
+    ys, offset = _read_column(view, offset, "d", count)
+    ids, offset = _read_column(view, offset, "I", count)
+    if version == 1:
+        arg_offsets = None
+        arg_index, offset = _read_column(view, offset, "I", count)
+    else:
+        arg_offsets, offset = _read_column(view, offset, "I", count + 1)
+        arg_index, offset = _read_column(view, offset, "I", arg_offsets[-1])
+    text_offsets, offset = _read_column(view, offset, "I", text_count + 1)
+    type_index, offset = _read_column(view, offset, "H", count)
+    type_blob, offset = _read_blob(view, offset, type_blob_size)
+    text_blob, offset = _read_blob(view, offset, text_blob_size)
+
+    types = type_blob.decode("utf-8").split("\n") if count else []
+    texts = [text_blob[text_offsets[i]:text_offsets[i + 1]].decode("utf-8") for i in range(text_count)]
+    return ids, type_index, arg_offsets, arg_index, xs, ys, types, texts
+
+
+def _block_args(types, type_index, arg_offsets, arg_index, texts):
+    shared = {}
+    if arg_offsets is None:
+        for i, text in enumerate(arg_index):
+            key = (type_index[i], text)
+            args = shared.get(key)
+            if args is None:
+                args = shared[key] = legacy_args(types[type_index[i]], texts[text])
+            yield args
+        return
+    for i in range(len(arg_offsets) - 1):
+        key = (type_index[i],) + tuple(arg_index[arg_offsets[i]:arg_offsets[i + 1]])
+        args = shared.get(key)
+        if args is None:
+            args = shared[key] = checked_args(types[type_index[i]], tuple(texts[j] for j in key[1:]))
+        yield args
+
+
+def load_binary(path, model=None):
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            raise ProjectError("Empty program file") from e
+    with data:
+        view = memoryview(data)
+        try:
+            ids, type_index, arg_offsets, arg_index, xs, ys, types, texts = _load_columns(view)
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ProjectError(f"Corrupt program file: {e}") from e
+        finally:
+            view.release()
+
+    model = BlockModel() if model is None else model
+    add_block = model.add_block
+    try:
+        block_args = _block_args(types, type_index, arg_offsets, arg_index, texts)
+        for i, args in enumerate(block_args):
+            add_block(types[type_index[i]], args, xs[i], ys[i], node_id=ids[i])
+    except IndexError as e:
+        raise ProjectError("Corrupt program file") from e
+    return model
+
+
+def is_binary(path):
+    with open(path, "rb") as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def load_program(path, model=None):
+    if is_binary(path):
+        return load_binary(path, model)
+    return load_json(path, model)
+
+
+def save_program(model, path):
+    if path.lower().endswith(".json"):
+        save_json(model, path)
+    else:
+        save_binary(model, path)
@@ -0,0 +1,241 @@
+import ast
+
+
+class ArgumentError(ValueError):
+    def __init__(self, field, message):
+        super().__init__(message)
+        self.field = field
+
+
+class Field:
+    __slots__ = ("prompt", "default", "kind")
+
+    def __init__(self, prompt, default, kind="expression"):
+        self.prompt = prompt
+        self.default = default
+        self.kind = kind
+
+
+def _check_expression(value):
+    ast.parse(value, mode="eval")
+    return True
+
+
+def _check_arguments(value):
+    call = ast.parse(f"f({value})", mode="eval").body
+    return isinstance(call, ast.Call) and isinstance(call.func, ast.Name)
+
+
+def _check_statement(value):
+    body = ast.parse(value).body
+    return len(body) == 1 and not hasattr(body[0], "body")
+
+
+def _check_signature(value):
+    body = ast.parse(f"def {value}: pass").body
+    return len(body) == 1 and isinstance(body[0], ast.FunctionDef) and len(body[0].body) == 1
+
+
+FIELD_CHECKS = {
+    "expression": (_check_expression, "is not a valid expression"),
+    "arguments": (_check_arguments, "is not a valid argument list"),
+    "statement": (_check_statement, "is not a single simple statement"),
+    "signature": (_check_signature, "is not a valid function name and parameter list"),
+}
+
+
+class BlockSpec:
+    __slots__ = ("name", "label", "category", "color", "template", "fields", "container",
+                 "defaults", "emit_line")
+
+    def __init__(self, name, label, category, color, template, fields=(), container=False):
+        self.name = name
+        self.label = label
+        self.category = category
+        self.color = color
+        self.template = template
+        self.fields = tuple(fields)
+        self.container = container
+        self.defaults = tuple(field.default for field in self.fields)
+        self.emit_line = template.format
+
+    def format_text(self, args):
+        if not args:
+            return self.name
+        return f"{self.name}: {', '.join(args)}"
+
+    def parse(self, text):
+        _, separator, payload = text.partition(": ")
+        field_count = len(self.fields)
+        if not separator or field_count == 0:
+            return ("",) * field_count
+        if field_count == 1:
+            return (payload,)
+        values = [value.strip() for value in payload.split(",", field_count - 1)]
+        return tuple(values + [""] * (field_count - len(values)))
+
+    def _parse_line(self, args):
+        source = self.emit_line(*args)
+        if self.container:
+            source += "\n    pass"
+        try:
+            return ast.parse(source, mode="exec")
+        except SyntaxError:
+            return None
+
+    def validate(self, args):
+        args = tuple(value.strip() for value in args)
+        if len(args) != len(self.fields):
+            raise ArgumentError(None, f"{self.label} takes {len(self.fields)} arguments, got {len(args)}")
+
+        for index, (field, value) in enumerate(zip(self.fields, args)):
+            if not value:
+                raise ArgumentError(index, f"{field.prompt} must not be empty")
+            if "\n" in value or "\r" in value:
+                raise ArgumentError(index, f"{field.prompt} must be a single line")
+            check, problem = FIELD_CHECKS[field.kind]
+            try:
+                valid = check(value)
+            except SyntaxError:
+                valid = False
+            if not valid:
+                raise ArgumentError(index, f"{value!r} {problem}")
+
+        tree = self._parse_line(args)
+        if tree is None or len(tree.body) != 1:
+            raise ArgumentError(0, f"{self.emit_line(*args)!r} is not valid Python")
+
+        expected = ast.dump(tree)
+        for index, field in enumerate(self.fields):
+            if field.kind != "expression":
+                continue
+            grouped = list(args)
+            grouped[index] = f"({args[index]})"
+            tree = self._parse_line(grouped)
+            if tree is None or ast.dump(tree) != expected:
+                raise ArgumentError(index, f"{args[index]!r} needs parentheses in this block")
+        return args
+
+    def emit(self, args, indent):
+        return indent + self.emit_line(*args)
+
+
+BLOCK_TYPES = {}
+
+
+def register(spec):
+    BLOCK_TYPES[spec.name] = spec
+    return spec
+
+
+def get_spec(block_type):
+    return BLOCK_TYPES.get(block_type)
+
+
+def default_args(block_type):
+    spec = BLOCK_TYPES.get(block_type)
+    return spec.defaults if spec is not None else ()
+
+
+def display_text(block_type, args):
+    spec = BLOCK_TYPES.get(block_type)
+    return spec.format_text(args) if spec is not None else block_type
+
+
+def parse_text(block_type, text):
+    spec = BLOCK_TYPES.get(block_type)
+    return spec.parse(text) if spec is not None else ()
+
+
+def is_container(block_type):
+    spec = BLOCK_TYPES.get(block_type)
+    return spec is not None and spec.container
+
+
+def categories():
+    grouped = {}
+    for spec in BLOCK_TYPES.values():
+        if spec.category:
+            grouped.setdefault(spec.category, []).append(spec)
+    return grouped
+
+
+RESULT_FIELD = Field("Enter the variable to save result:", "result")
+FIRST_FIELD = Field("Enter first value/variable:", "x")
+SECOND_FIELD = Field("Enter second value/variable:", "y")
+
+
+def _two_input(name, label, color, operator):
+    return BlockSpec(name, label, "Arithmetic", color, f"{{0}} = {{1}} {operator} {{2}}",
+                     [RESULT_FIELD, FIRST_FIELD, SECOND_FIELD])
+
+
+def _conversion(name, label, color, function):
+    return BlockSpec(name, label, "Type Conversion", color, f"{{0}} = {function}({{1}})",
+                     [RESULT_FIELD, Field("Enter variable to convert:", "x")])
+
+
+for _spec in [
+    BlockSpec("Print", "Print", "Basic", "#bb9af7", "print({0})",
+              [Field("Enter value to print:", "'Hello World'", "arguments")]),
+    BlockSpec("Variable", "Variable", "Basic", "#7dcfff", "{0}",
+              [Field("Enter variable and value (e.g., x = 10):", "x = 10", "statement")]),
+    BlockSpec("Loop", "Loop", "Basic", "#ff9e64", "for i in {0}:",
+              [Field("Enter iterable (e.g., range(5)):", "range(5)")], container=True),
+    BlockSpec("Condition", "Condition", "Basic", "#9ece6a", "if {0}:",
+              [Field("Enter condition (e.g., x > 5):", "x > 5")], container=True),
+    BlockSpec("WhileLoop", "While Loop", "Basic", "#f7768e", "while {0}:",
+              [Field("Enter while condition (e.g., x < 10):", "x < 10")], container=True),
+
+    _two_input("Addition", "Addition", "#73daca", "+"),
+    _two_input("Subtraction", "Subtraction", "#ff7a93", "-"),
+    _two_input("Multiplication", "Multiplication", "#b4f9f0", "*"),
+    _two_input("Division", "Division", "#ffa656", "/"),
+    BlockSpec("Rounding", "Rounding", "Arithmetic", "#c0caf5", "{0} = round({1}, {2})",
+              [RESULT_FIELD, Field("Enter variable to round:", "x"), Field("Enter decimal places:", "2")]),
+    _two_input("Modulo", "Modulo", "#ff9e64", "%"),
+
+    BlockSpec("Exponentiation", "Exponentiation", "Computational", "#73daca", "{0} = {1} ** {2}",
+              [RESULT_FIELD, Field("Enter base:", "x"), Field("Enter exponent:", "y")]),
+    BlockSpec("SquareRoot", "Square Root", "Computational", "#7dcfff", "{0} = {1} ** 0.5",
+              [RESULT_FIELD, Field("Enter variable to square root:", "x")]),
+    BlockSpec("AbsoluteValue", "Absolute Value", "Computational", "#9ece6a", "{0} = abs({1})",
+              [RESULT_FIELD, Field("Enter variable:", "x")]),
+    BlockSpec("MinMax", "Min/Max", "Computational", "#ff9e64", "{0} = max({1}, {2})",
+              [RESULT_FIELD, FIRST_FIELD, SECOND_FIELD]),
+
+    BlockSpec("Function", "Function", "Control Flow", "#bb9af7", "def {0}:",
+              [Field("Enter function name and parameters:", "my_function(param1, param2)",
+                     "signature")], container=True),
+    BlockSpec("Return", "Return", "Control Flow", "#f7768e", "return {0}",
+              [Field("Enter return value:", "value")]),
+    BlockSpec("Break", "Break", "Control Flow", "#ff7a93", "break"),
+    BlockSpec("Continue", "Continue", "Control Flow", "#ffa656", "continue"),
+
+    BlockSpec("ListCreate", "List Create", "Data Structures", "#b4f9f0", "{0} = {1}",
+              [Field("Enter list variable:", "my_list"), Field("Enter list values:", "[1, 2, 3]")]),
+    BlockSpec("DictCreate", "Dict Create", "Data Structures", "#ff9e64", "{0} = {1}",
+              [Field("Enter dictionary variable:", "my_dict"), Field("Enter dictionary:", "{'key': 'value'}")]),
+    BlockSpec("ListAppend", "List Append", "Data Structures", "#7dcfff", "{0}.append({1})",
+              [Field("Enter list variable:", "my_list"), Field("Enter item to append:", "new_item")]),
+    BlockSpec("Comprehension", "Comprehension", "Data Structures", "#bb9af7", "{0} = {1}",
+              [RESULT_FIELD, Field("Enter comprehension:", "[x for x in range(10)]")]),
+
+    _conversion("StringConvert", "String Convert", "#73daca", "str"),
+    _conversion("IntConvert", "Int Convert", "#7dcfff", "int"),
+    _conversion("FloatConvert", "Float Convert", "#9ece6a", "float"),
+    BlockSpec("TypeCheck", "Type Check", "Type Conversion", "#ff7a93", "{0} = type({1})",
+              [RESULT_FIELD, Field("Enter variable to check:", "x")]),
+
+    BlockSpec("StringConcat", "String Concat", "String Manipulation", "#bb9af7", "{0} = {1} + {2}",
+              [RESULT_FIELD, Field("Enter first string:", "str1"), Field("Enter second string:", "str2")]),
+    BlockSpec("StringSplit", "String Split", "String Manipulation", "#b4f9f0", "{0} = {1}.split({2})",
+              [RESULT_FIELD, Field("Enter string to split:", "string"), Field("Enter delimiter:", "delimiter")]),
+    BlockSpec("StringFormat", "String Format", "String Manipulation", "#7aa2f7", "{0} = {1}.format({2})",
+              [RESULT_FIELD, Field("Enter format template:", "'{} {}'"),
+               Field("Enter values:", "values", "arguments")]),
+    BlockSpec("StringLength", "String Length", "String Manipulation", "#ffa656", "{0} = len({1})",
+              [RESULT_FIELD, Field("Enter string:", "string")]),
+]:
+    register(_spec)
+del _spec
@@ -0,0 +1,138 @@
+from bisect import bisect_left, bisect_right, insort
+import math
+
+
+class SpatialIndex:
+    def __init__(self, cell_width, cell_height):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self._positions = {}
+        self._rows = {}
+        self._row_keys = []
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def cell(self, x, y):
+        return math.floor(x / self.cell_width), math.floor(y / self.cell_height)
+
+    def position(self, item):
+        return self._positions[item]
+
+    def insert(self, item, x, y):
+        if item in self._positions:
+            self.move(item, x, y)
+            return
+        self._positions[item] = (x, y)
+        self._add_to_cell(item, x, y)
+
+    def move(self, item, x, y):
+        old = self._positions.get(item)
+        if old is None:
+            self.insert(item, x, y)
+            return
+        self._positions[item] = (x, y)
+        if self.cell(*old) != self.cell(x, y):
+            self._remove_from_cell(item, *old)
+            self._add_to_cell(item, x, y)
+
+    def remove(self, item):
+        old = self._positions.pop(item, None)
+        if old is not None:
+            self._remove_from_cell(item, *old)
+
+    def clear(self):
+        self._positions.clear()
+        self._rows.clear()
+        self._row_keys.clear()
+
+    def _add_to_cell(self, item, x, y):
+        col, row = self.cell(x, y)
+        cols = self._rows.get(row)
+        if cols is None:
+            cols = self._rows[row] = {}
+            insort(self._row_keys, row)
+        cols.setdefault(col, []).append(item)
+
+    def _remove_from_cell(self, item, x, y):
+        col, row = self.cell(x, y)
+        cols = self._rows[row]
+        cell = cols[col]
+        cell.remove(item)
+        if not cell:
+            del cols[col]
+            if not cols:
+                del self._rows[row]
+                del self._row_keys[bisect_left(self._row_keys, row)]
+
+    def query(self, x0, y0, x1, y1):
+        c0, r0 = self.cell(x0, y0)
+        c1, r1 = self.cell(x1, y1)
+        lo = bisect_left(self._row_keys, r0)
+        hi = bisect_right(self._row_keys, r1)
+        found = []
+        for row in self._row_keys[lo:hi]:
+            cols = self._rows[row]
+            if c1 - c0 < len(cols):
+                cells = [cols[col] for col in range(c0, c1 + 1) if col in cols]
+            else:
+                cells = [cell for col, cell in cols.items() if c0 <= col <= c1]
+            for cell in cells:
+                for item in cell:
+                    x, y = self._positions[item]
+                    if x0 <= x <= x1 and y0 <= y <= y1:
+                        found.append(item)
+        return found
+
+    def band(self, y0, y1):
+        _, r0 = self.cell(0, y0)
+        _, r1 = self.cell(0, y1)
+        lo = bisect_left(self._row_keys, r0)
+        hi = bisect_right(self._row_keys, r1)
+        found = []
+        for row in self._row_keys[lo:hi]:
+            for cell in self._rows[row].values():
+                for item in cell:
+                    if y0 <= self._positions[item][1] <= y1:
+                        found.append(item)
+        return found
+
+    def preceding_y(self, y):
+        _, row = self.cell(0, y)
+        position = bisect_right(self._row_keys, row)
+        while position > 0:
+            position -= 1
+            cols = self._rows[self._row_keys[position]]
+            best = max((self._positions[item][1] for cell in cols.values() for item in cell
+                        if self._positions[item][1] < y), default=None)
+            if best is not None:
+                return best
+        return None
+
+    def sorted_by_y(self):
+        positions = self._positions
+        ordered = []
+        for row in self._row_keys:
+            row_items = [item for cell in self._rows[row].values() for item in cell]
+            row_items.sort(key=lambda item: (positions[item][1], positions[item][0]))
+            ordered.extend(row_items)
+        return ordered
+
+    def rows(self, tolerance):
+        positions = self._positions
+        groups = []
+        anchor = None
+        for item in self.sorted_by_y():
+            y = positions[item][1]
+            if groups and y - anchor <= tolerance:
+                groups[-1].append(item)
+            else:
+                groups.append([item])
+                anchor = y
+        return groups
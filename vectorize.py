@@ -0,0 +1,192 @@
+import ast
+import copy
+
+from optimizer import store_counts
+
+RUNTIME_NAME = "_vl_vector_loop"
+RANGE_NAME = "_vl_range"
+VALUES_NAME = "_vl_values"
+MIN_LENGTH = 256
+EXACT_LIMIT = 2 ** 53
+VECTOR_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+FALLBACK_ERRORS = (ArithmeticError, ValueError, TypeError, NameError, MemoryError)
+
+
+def _atom(node):
+    if isinstance(node, ast.Name):
+        return isinstance(node.ctx, ast.Load)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        node = node.operand
+    return isinstance(node, ast.Constant) and type(node.value) in (int, float)
+
+
+def _step(statement):
+    if isinstance(statement, ast.Assign):
+        if len(statement.targets) != 1 or not isinstance(statement.targets[0], ast.Name):
+            return None
+        value = statement.value
+        if _atom(value):
+            return "assign", statement.targets[0].id, value, [value]
+        if (isinstance(value, ast.BinOp) and isinstance(value.op, VECTOR_OPERATORS)
+                and _atom(value.left) and _atom(value.right)):
+            return "assign", statement.targets[0].id, value, [value.left, value.right]
+        return None
+
+    if isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call):
+        call = statement.value
+        function = call.func
+        if (isinstance(function, ast.Attribute) and function.attr == "append"
+                and isinstance(function.value, ast.Name) and len(call.args) == 1
+                and not call.keywords and _atom(call.args[0])):
+            return "append", function.value.id, call.args[0], call.args
+    return None
+
+
+def match_loop(loop, counts):
+    if not isinstance(loop, ast.For) or loop.orelse or not isinstance(loop.target, ast.Name):
+        return None
+    iterable = loop.iter
+    if not (isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Name) and iterable.func.id == "range"
+            and counts["range"] == 0 and not iterable.keywords and 1 <= len(iterable.args) <= 3
+            and all(_atom(arg) for arg in iterable.args)):
+        return None
+
+    index = loop.target.id
+    steps = [_step(statement) for statement in loop.body]
+    if not steps or None in steps:
+        return None
+
+    temps = []
+    lists = []
+    invariants = []
+    for kind, target, _, operands in steps:
+        for operand in operands:
+            if not isinstance(operand, ast.Name):
+                continue
+            name = operand.id
+            if name in lists or (name not in temps and any(name == step[1] for step in steps)):
+                return None
+            if name != index and name not in temps and name not in invariants:
+                invariants.append(name)
+        if target == index or target in invariants:
+            return None
+        if kind == "assign":
+            if target in temps or target in lists:
+                return None
+            temps.append(target)
+        else:
+            if target in lists or target in temps:
+                return None
+            lists.append(target)
+    return index, temps, lists, invariants, steps
+
+
+def _tuple(items):
+    return "(" + "".join(f"{item}, " for item in items) + ")"
+
+
+def _place(node, location):
+    for child in ast.walk(node):
+        if "lineno" in child._attributes:
+            ast.copy_location(child, location)
+    return node
+
+
+def _kernel(index, invariants, steps):
+    arguments = ast.arguments(posonlyargs=[], args=[ast.arg(name) for name in [index] + invariants],
+                              kwonlyargs=[], kw_defaults=[], defaults=[])
+    assigned = [ast.NamedExpr(ast.Name(target, ast.Store()), copy.deepcopy(value))
+                for kind, target, value, _ in steps if kind == "assign"]
+    appended = [copy.deepcopy(value) for kind, _, value, _ in steps if kind == "append"]
+    body = ast.Tuple([ast.Tuple(assigned, ast.Load()), ast.Tuple(appended, ast.Load())], ast.Load())
+    return ast.Lambda(arguments, body)
+
+
+def vector_statements(loop, match):
+    index, temps, lists, invariants, steps = match
+    bindings = f"lambda: ({_tuple(invariants)}, {_tuple(lists)})"
+    source = (f"{RANGE_NAME} = range()\n"
+              f"{VALUES_NAME} = {RUNTIME_NAME}({RANGE_NAME}, None, {bindings}, {len(temps)})\n"
+              f"if {VALUES_NAME} is None:\n"
+              f"    pass\n"
+              f"else:\n"
+              f"    {', '.join([index] + temps)}, = {VALUES_NAME}\n")
+    statements = ast.parse(source).body
+    statements[0].value.args = loop.iter.args
+    statements[1].value.args[1] = _kernel(index, invariants, steps)
+    statements = [_place(statement, loop) for statement in statements]
+    loop.iter = _place(ast.Name(RANGE_NAME, ast.Load()), loop.iter)
+    statements[-1].body = [loop]
+    return statements
+
+
+class LoopVectorizer(ast.NodeTransformer):
+    def __init__(self, counts):
+        self.counts = counts
+        self.vectorized = 0
+
+    def visit_For(self, node):
+        self.generic_visit(node)
+        match = match_loop(node, self.counts)
+        if match is None:
+            return node
+        self.vectorized += 1
+        return vector_statements(node, match)
+
+
+def vectorize(module):
+    counts = store_counts(module)
+    if any(counts[name] for name in (RUNTIME_NAME, RANGE_NAME, VALUES_NAME)):
+        return module
+    vectorizer = LoopVectorizer(counts)
+    module = vectorizer.visit(module)
+    if vectorizer.vectorized and module.body:
+        runtime_import = ast.ImportFrom("vectorize", [ast.alias("vector_loop", RUNTIME_NAME)], 0)
+        module.body.insert(0, ast.copy_location(runtime_import, module.body[0]))
+    return ast.fix_missing_locations(module)
+
+
+def _exact(value):
+    if type(value) is int:
+        return -EXACT_LIMIT < value < EXACT_LIMIT
+    return type(value) is float
+
+
+def vector_loop(loop_range, kernel, bindings, temp_count):
+    if not (_exact(loop_range.start) and _exact(loop_range.stop) and _exact(loop_range.step)):
+        return None
+    if len(loop_range) < MIN_LENGTH:
+        return None
+    try:
+        import numpy
+    except ImportError:
+        return None
+    try:
+        invariants, lists = bindings()
+    except NameError:
+        return None
+    if not all(_exact(value) for value in invariants):
+        return None
+    if not all(type(target) is list for target in lists) or len(set(map(id, lists))) != len(lists):
+        return None
+
+    try:
+        index = numpy.arange(loop_range.start, loop_range.stop, loop_range.step, dtype=numpy.int64)
+        with numpy.errstate(all="raise"):
+            temps, appended = kernel(index, *invariants)
+            shadow_temps, shadow_appended = kernel(index.astype(numpy.float64), *map(float, invariants))
+        results = []
+        for value, shadow in zip(temps + appended, shadow_temps + shadow_appended):
+            value = numpy.asarray(value)
+            if value.dtype.kind == "i":
+                if not numpy.all(numpy.abs(shadow) < EXACT_LIMIT):
+                    return None
+            elif value.dtype.kind != "f":
+                return None
+            results.append(numpy.broadcast_to(value, index.shape))
+    except FALLBACK_ERRORS:
+        return None
+
+    for target, values in zip(lists, results[temp_count:]):
+        target.extend(values.tolist())
+    return (loop_range[-1],) + tuple(values[-1].item() for values in results[:temp_count])